@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from blobs import BLOB_THRESHOLD
+from store import HistoryStore, text_digest
+
+# An archive is a header line, then one record per entry: a JSON line of
+# metadata naming the payload parts that follow it as raw bytes, e.g.
+#   {"ts": ..., "type": "image", ..., "parts": [["image", 81234], ["thumb", 3120]]}
+# Text is UTF-8, images are the stored (compressed) DIB and the PNG thumbnail.
+# Entries are written and read one at a time and large payloads are copied
+# straight between blob files and the archive, so memory stays flat
+ARCHIVE_MAGIC  = b"CLIPVAULT-ARCHIVE 1\n"
+META_FIELDS    = ("ts", "type", "label", "width", "height", "mode", "digest", "size")
+PROGRESS_EVERY = 256
+INSERT_BATCH   = 256
+
+class ArchiveError(Exception):
+    pass
+
+# Writes every entry of store to path, oldest id first; returns the count.
+# progress(done, total) is called in entries
+def export_history(store: HistoryStore, path: str, progress=None, cancelled=None):
+    total = store.count()
+    done  = 0
+    tmp   = path + ".part"
+    try:
+        with open(tmp, "wb") as out:
+            out.write(ARCHIVE_MAGIC)
+            for rows in store.rows():
+                if cancelled and cancelled():
+                    raise ArchiveError("cancelled")
+                for row in rows:
+                    _export_row(store, out, row)
+                    done += 1
+                    if progress and done % PROGRESS_EVERY == 0:
+                        progress(done, total)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    if progress:
+        progress(done, max(total, done))
+    return done
+
+def _export_row(store, out, row):
+    _, ts, kind, label, text, image, thumb, width, height, blob, mode, digest, size = row
+    mm = store.blobs.open(blob) if blob else None
+    if kind == "image":
+        payload = image if image is not None else mm
+        parts   = [("image", payload), ("thumb", thumb or b"")]
+    else:
+        payload = text.encode("utf-8") if text is not None else mm
+        parts   = [("text", payload)]
+        if digest is None and payload is not None:
+            digest = text_digest(payload)
+    try:
+        if payload is None:
+            # Blob file missing; nothing worth exporting
+            return
+        meta = dict(zip(META_FIELDS, (ts, kind, label, width, height, mode, digest, size)))
+        meta["parts"] = [[name, len(data)] for name, data in parts]
+        out.write(json.dumps(meta, ensure_ascii=False).encode("utf-8") + b"\n")
+        for _, data in parts:
+            out.write(data)
+    finally:
+        if mm is not None:
+            mm.close()
+
+# Adds the entries of the archive at path to store, skipping any whose
+# content is already there; returns (added, skipped). progress(done, total)
+# is called in bytes read
+def import_history(store: HistoryStore, path: str, progress=None, cancelled=None):
+    total   = os.path.getsize(path)
+    added   = skipped = 0
+    pending = []
+    # Digests of the batch not yet inserted; earlier batches are in the store
+    batch   = set()
+    with open(path, "rb") as src:
+        if src.readline() != ARCHIVE_MAGIC:
+            raise ArchiveError(f"{path} is not a ClipVault archive")
+        while True:
+            line = src.readline()
+            if not line:
+                break
+            try:
+                meta = json.loads(line)
+            except ValueError:
+                raise ArchiveError(f"bad record at byte {src.tell() - len(line)}")
+            digest = meta.get("digest")
+            if digest is not None and (digest in batch or store.has_digest(digest)):
+                for _, length in meta.get("parts") or ():
+                    src.seek(length, os.SEEK_CUR)
+                skipped += 1
+            else:
+                pending.append(_import_record(store, src, meta))
+                batch.add(digest)
+                added += 1
+            if len(pending) >= INSERT_BATCH:
+                store.insert_rows(pending)
+                pending.clear()
+                batch.clear()
+            if (added + skipped) % PROGRESS_EVERY == 0:
+                if cancelled and cancelled():
+                    break
+                if progress:
+                    progress(src.tell(), total)
+    if pending:
+        store.insert_rows(pending)
+    if progress:
+        progress(total, total)
+    return added, skipped
+
+def _read(src, length):
+    data = src.read(length)
+    if len(data) != length:
+        raise ArchiveError("archive is truncated")
+    return data
+
+def _import_record(store, src, meta):
+    text = image = thumb = blob = None
+    for name, length in meta.get("parts") or ():
+        if name in ("text", "image") and length > BLOB_THRESHOLD:
+            blob = store.blobs.put_stream(src, length)
+        elif name == "text":
+            data = _read(src, length)
+            try:
+                text = data.decode("utf-8")
+            except UnicodeDecodeError:
+                # Lone surrogates, which only a blob holds (store._encode)
+                blob = store.blobs.put(data)
+        elif name == "image":
+            image = _read(src, length)
+        elif name == "thumb":
+            thumb = _read(src, length) or None
+        else:
+            src.seek(length, os.SEEK_CUR)
+    return (store.next_id(), meta["ts"], meta["type"], meta["label"],
+            text, image, thumb, meta.get("width"), meta.get("height"), blob,
+            meta.get("mode"), meta.get("digest"), meta.get("size") or 0)
+
+
+class ArchiveThread(QThread):
+    # (done, total) in entries for export, bytes for import
+    progress  = pyqtSignal(int, int)
+    # (ok, message)
+    completed = pyqtSignal(bool, str)
+
+    def __init__(self, store: HistoryStore, op: str, path: str):
+        super().__init__()
+        self._store   = store
+        self._op      = op
+        self._path    = path
+        self._running = True
+
+    def run(self):
+        cancelled = lambda: not self._running
+        try:
+            if self._op == "export":
+                count = export_history(self._store, self._path, self.progress.emit, cancelled)
+                message = f"Exported {count} item{'s' if count != 1 else ''}"
+            else:
+                added, skipped = import_history(self._store, self._path, self.progress.emit, cancelled)
+                message = f"Imported {added} item{'s' if added != 1 else ''}, {skipped} already in history"
+        except (OSError, ArchiveError, ValueError, KeyError) as e:
+            print(f"[ArchiveThread] {self._op} failed: {e}")
+            self.completed.emit(False, f"{self._op.capitalize()} failed: {e}")
+            return
+        finally:
+            self._store.release()
+        self.completed.emit(True, message)
+
+    def stop(self):
+        self._running = False
+
+
+# python archive.py export|import FILE [DB]. Import only while ClipVault is
+# not running; a running instance imports from the tray menu
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] not in ("export", "import"):
+        sys.exit("usage: archive.py export|import FILE [DB]")
+    op, path = sys.argv[1], sys.argv[2]
+    store = HistoryStore(sys.argv[3] if len(sys.argv) == 4 else None)
+
+    def report(done, total):
+        sys.stderr.write(f"\r{op}: {100 * done // max(total, 1)}%")
+
+    try:
+        if op == "export":
+            print(f"\n{export_history(store, path, report)} items exported")
+        else:
+            added, skipped = import_history(store, path, report)
+            print(f"\n{added} items imported, {skipped} already present")
+    except (OSError, ArchiveError) as e:
+        sys.exit(f"\n{op} failed: {e}")
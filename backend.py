@@ -1,21 +1,26 @@
 import ctypes
 import ctypes.wintypes
+import os
 import time
-import io
-from datetime import datetime
 
 import win32clipboard
 import win32con
 import win32api
-from PIL import Image
+import win32gui
 
-from PyQt6.QtCore import QThread, pyqtSignal, QTimer
+from PyQt6.QtCore import QObject, QThread, pyqtSignal, QTimer
+from PyQt6.QtWidgets import QApplication
+
+import dib as dibfmt
+from clipitem import ClipItem
+from latency import spans
 
 # Windows constants
 MOD_CTRL     = 0x0002
 MOD_SHIFT    = 0x0004
 MOD_NOREPEAT = 0x4000
 user32       = ctypes.windll.user32
+kernel32     = ctypes.windll.kernel32
 
 class HotkeyThread(QThread):
     triggered = pyqtSignal()
@@ -40,6 +45,10 @@ class HotkeyThread(QThread):
             while self._running:
                 if user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, 1):
                     if msg.message == 0x0312 and msg.wParam == self.hk_id:
+                        # msg.time is the tick count when the hotkey was posted
+                        waited = (kernel32.GetTickCount() - msg.time) & 0xFFFFFFFF
+                        spans.begin("show", time.perf_counter_ns() - waited * 1_000_000)
+                        spans.mark("show", "hotkey")
                         self.triggered.emit()
                 time.sleep(0.02)
         finally:
@@ -52,8 +61,59 @@ class HotkeyThread(QThread):
     def stop(self):
         self._running = False
 
+# Clipboard sources share one interface: a new_item(ClipItem) signal plus
+# start(), stop() and wait(ms); pick one with make_clipboard_source()
+def _text_item(text: str):
+    if not text or not text.strip():
+        return None
+    return ClipItem.from_text(text)
+
+class QtClipboardSource(QObject):
+    new_item = pyqtSignal(object)
+
+    def __init__(self, clipboard=None):
+        super().__init__()
+        self._clipboard = clipboard or QApplication.clipboard()
+        self._running   = False
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self._clipboard.dataChanged.connect(self._on_changed)
+
+    def _on_changed(self):
+        if not self._running:
+            return
+        try:
+            item = self._read()
+        except Exception as e:
+            print(f"[QtClipboardSource] read failed: {e}")
+            return
+        if item:
+            self.new_item.emit(item)
+
+    def _read(self):
+        mime = self._clipboard.mimeData()
+        if mime is None:
+            return None
+        if mime.hasImage():
+            qimg = self._clipboard.image()
+            if not qimg.isNull():
+                return ClipItem.from_qimage(qimg)
+        if mime.hasText():
+            return _text_item(mime.text())
+        return None
+
+    def stop(self):
+        if self._running:
+            self._running = False
+            self._clipboard.dataChanged.disconnect(self._on_changed)
+
+    def wait(self, ms=None):
+        return True
+
 class ClipboardWatcher(QThread):
-    new_item = pyqtSignal(dict)
+    new_item = pyqtSignal(object)
 
     def __init__(self):
         super().__init__()
@@ -74,28 +134,16 @@ class ClipboardWatcher(QThread):
                 pass
 
     def _read(self):
-        item = {"ts": datetime.now()}
         try:
             win32clipboard.OpenClipboard()
             if win32clipboard.IsClipboardFormatAvailable(win32con.CF_DIB):
                 data = win32clipboard.GetClipboardData(win32con.CF_DIB)
                 win32clipboard.CloseClipboard()
-                try:
-                    img = Image.open(io.BytesIO(data))
-                except Exception:
-                    import struct
-                    hdr = struct.pack('<2sIHHI', b'BM', len(data) + 14, 0, 0, 14)
-                    img = Image.open(io.BytesIO(hdr + data))
-                item.update(type="image", image=img.copy(),
-                            label=f"Image  {img.width}×{img.height}")
-                return item
+                return ClipItem.from_dib(bytes(data))
             if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
                 text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
                 win32clipboard.CloseClipboard()
-                if text and text.strip():
-                    item.update(type="text", text=text,
-                                label=text[:120].replace("\n", " "))
-                    return item
+                return _text_item(text)
             win32clipboard.CloseClipboard()
         except Exception:
             try:
@@ -107,32 +155,132 @@ class ClipboardWatcher(QThread):
     def stop(self):
         self._running = False
 
-# Paste helpers
+CLIPBOARD_SOURCES = {"qt": QtClipboardSource, "poll": ClipboardWatcher}
+
+def make_clipboard_source(kind=None):
+    kind = kind or os.environ.get("CLIPVAULT_CLIPBOARD", "qt")
+    return CLIPBOARD_SOURCES.get(kind, QtClipboardSource)()
+
+# Paste helpers. Each step waits on the state it needs (clipboard written,
+# target window in the foreground) instead of a fixed delay
+PASTE_POLL_MS    = 5
+PASTE_TIMEOUT_MS = 750
+# Extra wait once the target has focus, for windows slow to take input
+PASTE_SETTLE_MS  = int(os.environ.get("CLIPVAULT_PASTE_SETTLE", "0") or 0)
+# Hide the overlay at once on paste instead of fading it out
+INSTANT_PASTE    = os.environ.get("CLIPVAULT_PASTE", "") == "instant"
+
 def _send_paste():
     win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
     win32api.keybd_event(ord('V'), 0, 0, 0)
     win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
     win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
 
-def paste_text(text: str):
+# True once the clipboard holds data; fails while another process has it open
+# formats is a list of (format, data), all set in one clipboard session
+def _write_clipboard(formats):
     try:
+        seq = win32clipboard.GetClipboardSequenceNumber()
         win32clipboard.OpenClipboard()
-        win32clipboard.EmptyClipboard()
-        win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, text)
-        win32clipboard.CloseClipboard()
     except Exception:
-        pass
-    QTimer.singleShot(120, _send_paste)
-
-def paste_image(img: Image.Image):
-    output = io.BytesIO()
-    img.convert("RGB").save(output, "BMP")
-    data = output.getvalue()[14:]
+        return False
     try:
-        win32clipboard.OpenClipboard()
         win32clipboard.EmptyClipboard()
-        win32clipboard.SetClipboardData(win32con.CF_DIB, data)
-        win32clipboard.CloseClipboard()
+        for fmt, data in formats:
+            win32clipboard.SetClipboardData(fmt, data)
     except Exception:
-        pass
-    QTimer.singleShot(120, _send_paste)
\ No newline at end of file
+        return False
+    finally:
+        try:
+            win32clipboard.CloseClipboard()
+        except Exception:
+            pass
+    return win32clipboard.GetClipboardSequenceNumber() != seq
+
+# Writes the clipboard, waits for hwnd to hold the foreground, then sends
+# Ctrl+V. Gives up without sending keys if either does not happen in time
+class PasteJob(QObject):
+    done = pyqtSignal(bool)
+
+    def __init__(self, formats, hwnd=None):
+        super().__init__()
+        self._formats  = formats
+        self._hwnd     = hwnd
+        self._stage    = "clipboard"
+        self._deadline = 0.0
+        self._settled  = 0.0
+        self._timer    = QTimer(self)
+        self._timer.setInterval(PASTE_POLL_MS)
+        self._timer.timeout.connect(self._step)
+
+    def start(self):
+        spans.mark("paste", "queued")
+        self._deadline = time.monotonic() + PASTE_TIMEOUT_MS / 1000
+        self._step()
+        if self._stage is not None:
+            self._timer.start()
+
+    # Superseded by a newer paste, whose trace is already open under the
+    # same name; so the trace is left alone here
+    def cancel(self):
+        if self._stage is not None:
+            self._finish(False)
+
+    def _step(self):
+        if self._stage == "clipboard":
+            if not _write_clipboard(self._formats):
+                return self._check_deadline()
+            spans.mark("paste", "clipboard")
+            self._stage = "focus"
+            if self._hwnd and win32gui.GetForegroundWindow() != self._hwnd:
+                try:
+                    win32gui.SetForegroundWindow(self._hwnd)
+                except Exception:
+                    pass
+        if self._stage == "focus":
+            if self._hwnd and win32gui.GetForegroundWindow() != self._hwnd:
+                return self._check_deadline()
+            spans.mark("paste", "focus")
+            self._stage   = "settle"
+            self._settled = time.monotonic() + PASTE_SETTLE_MS / 1000
+        if self._stage == "settle":
+            if time.monotonic() < self._settled:
+                return
+            if PASTE_SETTLE_MS:
+                spans.mark("paste", "settle")
+            _send_paste()
+            spans.end("paste", "keys")
+            self._finish(True)
+
+    def _check_deadline(self):
+        if time.monotonic() > self._deadline:
+            print(f"[PasteJob] gave up waiting for {self._stage}")
+            spans.cancel("paste")
+            self._finish(False)
+
+    def _finish(self, ok: bool):
+        self._stage = None
+        self._timer.stop()
+        self.done.emit(ok)
+
+# A newer paste replaces one still waiting
+_job = None
+
+def _paste(formats, hwnd):
+    global _job
+    if _job is not None:
+        _job.cancel()
+    _job = PasteJob(formats, hwnd)
+    _job.start()
+    return _job
+
+def paste_text(text: str, hwnd=None):
+    return _paste([(win32con.CF_UNICODETEXT, text)], hwnd)
+
+# Hands the stored DIB bytes straight back; nothing is decoded or re-encoded.
+# One with a BITMAPV5HEADER (alpha) goes out as CF_DIBV5, with a plain
+# CF_DIB copy for readers that only take that
+def paste_image(dib: bytes, hwnd=None):
+    if dibfmt.has_v5_header(dib):
+        return _paste([(win32con.CF_DIBV5, dib), (win32con.CF_DIB, dibfmt.to_info(dib))], hwnd)
+    return _paste([(win32con.CF_DIB, dib)], hwnd)
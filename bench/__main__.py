@@ -0,0 +1,316 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Headless by default, with room for every history the suite builds
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("CLIPVAULT_BUDGET_MB", str(1024 * 1024))
+
+from bench import fakewin
+fakewin.install()
+
+from PIL import Image
+from PyQt6.QtWidgets import QApplication, QStyleOptionViewItem, QStyle
+from PyQt6.QtGui import QImage, QPainter, QColor
+from PyQt6.QtCore import QRect, PYQT_VERSION_STR, QT_VERSION_STR
+
+SIZES     = (200, 10_000, 100_000)
+WORKLOADS = {"text": 0.0, "mixed": 0.25}
+QUERIES   = ("config", "srv dpl", "e")
+SEED      = 1234
+REPEAT    = 15
+WARMUP    = 3
+THRESHOLD = 0.15
+# Differences under this many ms are noise whatever the ratio
+NOISE_MS  = 0.05
+WAIT_S    = 60
+
+WORDS = ("alpha beta config server deploy python clipboard vault import return docker "
+         "kubectl git commit branch select from where update insert token session user "
+         "error warning request response build test release staging production").split()
+
+app = QApplication.instance() or QApplication(sys.argv)
+
+import dib as dibfmt
+import store
+from backend import ClipboardWatcher, QtClipboardSource
+from blur import DesktopBlur
+from clipitem import ClipItem
+from overlay import FullscreenOverlay
+
+def pump(until, timeout=WAIT_S):
+    deadline = time.monotonic() + timeout
+    while not until():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark condition never became true")
+        app.processEvents()
+
+def noise_image(rng: random.Random, w: int, h: int):
+    img = Image.effect_noise((w, h), 40).convert("RGB")
+    return Image.merge("RGB", [b.point(lambda v, k=rng.randint(0, 80): v + k) for b in img.split()])
+
+def synthetic_text(rng: random.Random):
+    roll = rng.random()
+    if roll < 0.001:
+        n = rng.randint(15_000, 25_000)
+    elif roll < 0.05:
+        n = rng.randint(300, 1200)
+    else:
+        n = rng.randint(3, 30)
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+# Writes n rows straight into a fresh store: texts are encoded one by one,
+# images reuse a handful of encoded templates under fresh ids and digests
+def build_store(path: str, n: int, image_share: float, rng: random.Random):
+    st    = store.HistoryStore(path)
+    conn  = st._conn()
+    blobs = st._blobs
+    templates = []
+    for w, h in ((320, 200), (1280, 720), (1920, 1080)):
+        item = ClipItem.from_image(noise_image(rng, w, h))
+        item.id     = 0
+        item.digest = store.fingerprint(item)
+        item.size   = store.item_size(item)
+        templates.append(store._encode(item, blobs))
+
+    now  = time.time()
+    rows = []
+    for i in range(n):
+        ts = now - (n - i)
+        if rng.random() < image_share:
+            row = list(rng.choice(templates))
+            row[0], row[1], row[11] = i + 1, ts, f"{row[11][:-8]}{i:08x}"
+        else:
+            item = ClipItem("text", ts=ts, text=synthetic_text(rng), id=i + 1)
+            item.digest = store.fingerprint(item)
+            item.size   = store.item_size(item)
+            row = store._encode(item, blobs)
+        rows.append(tuple(row))
+    with conn:
+        conn.executemany(
+            f"INSERT INTO clips ({store.PUT_COLS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    st.release()
+    return store.HistoryStore(path)
+
+
+class Suite:
+    def __init__(self, repeat=REPEAT, warmup=WARMUP, only=None):
+        self.repeat  = repeat
+        self.warmup  = warmup
+        self.only    = only
+        self.results = []
+
+    def run(self, name, fn, setup=None, size="-", workload="-", repeat=None):
+        if self.only and self.only not in name:
+            return
+        samples = []
+        for n in range(self.warmup + (repeat or self.repeat)):
+            if setup is not None:
+                setup()
+            gc.collect()
+            gc.disable()
+            try:
+                t0 = time.perf_counter_ns()
+                fn()
+                dt = time.perf_counter_ns() - t0
+            finally:
+                gc.enable()
+            if n >= self.warmup:
+                samples.append(dt / 1e6)
+        samples.sort()
+        result = {
+            "bench":     name,
+            "size":      size,
+            "workload":  workload,
+            "median_ms": statistics.median(samples),
+            "p90_ms":    samples[min(len(samples) - 1, int(len(samples) * 0.9))],
+            "min_ms":    samples[0],
+            "runs":      len(samples),
+        }
+        self.results.append(result)
+        print(f"{name:32} {str(size):>7} {workload:>6} {result['median_ms']:10.3f} "
+              f"{result['p90_ms']:10.3f} {result['min_ms']:10.3f}", flush=True)
+
+
+def bench_history(suite: Suite, size: int, workload: str, tmp: str):
+    rng  = random.Random(SEED)
+    path = os.path.join(tmp, f"{workload}-{size}", "history.db")
+    t0   = time.perf_counter()
+    st   = build_store(path, size, WORKLOADS[workload], rng)
+    built = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    o  = FullscreenOverlay(st)
+    pump(lambda: not o._loading)
+    print(f"# {workload}-{size}: store {built:.1f}s, overlay loaded in "
+          f"{time.perf_counter() - t0:.2f}s", flush=True)
+    o.fade_in()
+    pump(lambda: o._anim is None or o._anim.state() == o._anim.State.Stopped)
+    tags = dict(size=size, workload=workload)
+
+    suite.run("overlay._rebuild", o._rebuild, **tags)
+    # Reopening from hidden; _capture_desktop is timed on its own below
+    def reopen():
+        o.fade_in()
+        o._anim.stop()
+    suite.run("overlay.fade_in", reopen, setup=o.hide, **tags)
+    o.setWindowOpacity(1.0)
+
+    for q in QUERIES:
+        def search(q=q):
+            o._search.blockSignals(True)
+            o._search.setText(q)
+            o._search.blockSignals(False)
+            o._filter()
+            pump(lambda: o._shown_query == q)
+        suite.run(f"overlay._filter[{q}]", search, setup=o._rebuild, **tags)
+    o._search.clear()
+    o._rebuild()
+
+    texts = iter(range(10 ** 9))
+    suite.run("overlay.add_item[text]",
+              lambda: o.add_item(ClipItem.from_text(f"bench {next(texts)} {rng.random()}")), **tags)
+    qimg = QImage(1920, 1080, QImage.Format.Format_RGB32)
+    pending = []
+    def image_setup():
+        qimg.fill(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        pending[:] = [ClipItem.from_qimage(qimg)]
+    suite.run("overlay.add_item[image]", lambda: o.add_item(pending[0]), setup=image_setup, **tags)
+    def ingest():
+        o.add_item(pending[0])
+        pump(lambda: not pending[0].pending)
+    suite.run("ingest[image]", ingest, setup=image_setup, **tags)
+
+    texts_in = [it for it in o._history if it.type == "text"]
+    images   = [it for it in o._history if it.type == "image"]
+    panel    = o._preview_panel
+    if texts_in:
+        item = max(texts_in[:200], key=lambda it: len(it.label))
+        suite.run("PreviewPanel.load[text]", lambda: panel.load(item), **tags)
+    if images:
+        suite.run("PreviewPanel.load[image]", lambda: panel.load(images[0]),
+                  setup=o._pixmaps.clear, **tags)
+
+    # Cards are painted by the delegate; this is what replaced constructing
+    # a ClipCard widget per entry
+    delegate = o._grid.card_delegate()
+    model    = o._model
+    canvas   = QImage(o._grid.viewport().size(), QImage.Format.Format_ARGB32_Premultiplied)
+    cells    = [model.index_for(pos) for pos in range(min(50, len(o._visible)))]
+    def paint_cards():
+        painter = QPainter(canvas)
+        option  = QStyleOptionViewItem()
+        option.font  = o._grid.font()
+        option.state = QStyle.StateFlag.State_Enabled
+        for index in cells:
+            option.rect = QRect(0, 0, 254, 144)
+            delegate.paint(painter, option, index)
+        painter.end()
+    suite.run("card_paint[50]", paint_cards, **tags)
+    suite.run("card_paint[50,cold]", paint_cards, setup=o._pixmaps.clear, **tags)
+
+    o.hide()
+    o.shutdown()
+    o.deleteLater()
+    app.processEvents()
+
+
+def bench_static(suite: Suite):
+    rng   = random.Random(SEED)
+    shot  = noise_image(rng, 1920, 1080)
+    dib   = dibfmt.from_image(shot)
+    text  = " ".join(rng.choice(WORDS) for _ in range(200))
+
+    watcher = ClipboardWatcher()
+    suite.run("ClipboardWatcher._read[text]", watcher._read, setup=lambda: fakewin.set_text(text))
+    suite.run("ClipboardWatcher._read[image]", watcher._read, setup=lambda: fakewin.set_dib(dib))
+
+    source = QtClipboardSource()
+    clip   = app.clipboard()
+    suite.run("QtClipboardSource._read[text]", source._read, setup=lambda: clip.setText(text))
+    qshot = QImage(1920, 1080, QImage.Format.Format_RGB32)
+    qshot.fill(QColor(30, 60, 90))
+    suite.run("QtClipboardSource._read[image]", source._read, setup=lambda: clip.setImage(qshot))
+
+    o = FullscreenOverlay(store.HistoryStore(os.path.join(tempfile.mkdtemp(), "history.db")))
+    pump(lambda: not o._loading)
+    suite.run("overlay._capture_desktop", o._capture_desktop)
+    suite.run("overlay._capture_desktop[cold]", o._capture_desktop,
+              setup=lambda: setattr(o, "_blur", DesktopBlur()))
+    o.shutdown()
+
+    # The offscreen screen is small and blank; time a real 4K frame too
+    frame = QImage(3840, 2160, QImage.Format.Format_RGB32)
+    frame.fill(QColor(40, 80, 120))
+    blur  = DesktopBlur()
+    suite.run("DesktopBlur.render[4k]", lambda: blur.render(frame), setup=lambda: setattr(blur, "_key", None))
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        base = {(r["bench"], r["size"], r["workload"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\n{'bench':32} {'size':>7} {'load':>6} {'base':>10} {'now':>10} {'change':>8}")
+    for r in results:
+        b = base.get((r["bench"], r["size"], r["workload"]))
+        if b is None:
+            continue
+        ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] else 1.0
+        worse = ratio > 1 + threshold and r["median_ms"] - b["median_ms"] > NOISE_MS
+        regressions += worse
+        print(f"{r['bench']:32} {str(r['size']):>7} {r['workload']:>6} {b['median_ms']:10.3f} "
+              f"{r['median_ms']:10.3f} {ratio - 1:+8.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench",
+                                     description="Time ClipVault's hot paths headless")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma-separated history sizes")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS),
+                        help=f"comma-separated, from {', '.join(WORKLOADS)}")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="median slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    suite = Suite(args.repeat, args.warmup, args.only)
+    print(f"{'bench':32} {'size':>7} {'load':>6} {'median ms':>10} {'p90 ms':>10} {'min ms':>10}")
+    bench_static(suite)
+    with tempfile.TemporaryDirectory() as tmp:
+        for workload in args.workloads.split(","):
+            for size in map(int, args.sizes.split(",")):
+                bench_history(suite, size, workload, tmp)
+
+    if args.json:
+        meta = {
+            "seed":     SEED,
+            "repeat":   args.repeat,
+            "python":   platform.python_version(),
+            "qt":       QT_VERSION_STR,
+            "pyqt":     PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "cpus":     os.cpu_count(),
+            "time":     time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": suite.results}, f, indent=1)
+    if args.compare:
+        return 1 if compare(suite.results, args.compare, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import ctypes
+import sys
+import types
+
+# In-process stand-ins for the pywin32 modules and ctypes.windll, enough for
+# backend.py and overlay.py to import and run headless. The clipboard keeps
+# its formats in a dict and bumps a sequence number like the real one
+class _Clipboard:
+    def __init__(self):
+        self.data  = {}
+        self.seq   = 0
+        self.opens = 0
+
+    def GetClipboardSequenceNumber(self):
+        return self.seq
+
+    def OpenClipboard(self, hwnd=None):
+        self.opens += 1
+
+    def CloseClipboard(self):
+        pass
+
+    def EmptyClipboard(self):
+        self.data.clear()
+        self.seq += 1
+
+    def IsClipboardFormatAvailable(self, fmt):
+        return fmt in self.data
+
+    def GetClipboardData(self, fmt):
+        return self.data[fmt]
+
+    def SetClipboardData(self, fmt, data):
+        self.data[fmt] = data
+        self.seq += 1
+
+class _Calls:
+    def __init__(self):
+        self.log = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.log.append((name, args))
+            return 0
+        return call
+
+clipboard = _Clipboard()
+user32    = _Calls()
+keys      = []
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    return mod
+
+# Replaces the real modules too, so a run on Windows never touches the
+# user's clipboard or sends keystrokes
+def install():
+    sys.modules["win32clipboard"] = _module(
+        "win32clipboard",
+        **{name: getattr(clipboard, name) for name in dir(_Clipboard) if name[0].isupper()})
+    sys.modules["win32con"] = _module(
+        "win32con", CF_DIB=8, CF_DIBV5=17, CF_UNICODETEXT=13, VK_CONTROL=0x11, KEYEVENTF_KEYUP=0x0002)
+    sys.modules["win32api"] = _module(
+        "win32api", keybd_event=lambda vk, scan, flags, extra: keys.append((vk, flags)))
+    sys.modules["win32gui"] = _module(
+        "win32gui", GetForegroundWindow=lambda: 1, SetForegroundWindow=lambda hwnd: None)
+    if not hasattr(ctypes, "windll"):
+        ctypes.windll = types.SimpleNamespace(user32=user32, kernel32=_Calls())
+
+def set_text(text: str):
+    clipboard.EmptyClipboard()
+    clipboard.SetClipboardData(13, text)
+
+def set_dib(dib: bytes):
+    clipboard.EmptyClipboard()
+    clipboard.SetClipboardData(8, dib)
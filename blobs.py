@@ -0,0 +1,76 @@
+import hashlib
+import mmap
+import os
+
+BLOB_THRESHOLD = 64 * 1024
+COPY_CHUNK     = 1024 * 1024
+
+class BlobStore:
+    def __init__(self, root):
+        self._root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str):
+        return os.path.join(self._root, digest[:2], digest[2:])
+
+    def put(self, data) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path   = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return digest
+
+    # Copies length bytes from the file src into the store a chunk at a time
+    def put_stream(self, src, length: int) -> str:
+        h   = hashlib.sha256()
+        tmp = os.path.join(self._root, f"stream.{os.getpid()}.{id(src)}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                left = length
+                while left:
+                    chunk = src.read(min(left, COPY_CHUNK))
+                    if not chunk:
+                        raise EOFError(f"{left} bytes short")
+                    h.update(chunk)
+                    f.write(chunk)
+                    left -= len(chunk)
+            digest = h.hexdigest()
+            path   = self._path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return digest
+
+    def open(self, digest: str):
+        try:
+            with open(self._path(digest), "rb") as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+    def read_text(self, digest: str):
+        mm = self.open(digest)
+        if mm is None:
+            return None
+        with mm:
+            return str(mm, "utf-8", "surrogatepass")
+
+    def size(self, digest: str):
+        try:
+            return os.path.getsize(self._path(digest))
+        except OSError:
+            return 0
+
+    def remove(self, digest: str):
+        try:
+            os.remove(self._path(digest))
+        except OSError:
+            # Still mapped by a reader (Windows) or already gone
+            pass
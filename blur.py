@@ -0,0 +1,64 @@
+import zlib
+
+from PIL import Image, ImageFilter
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPixmap
+
+from latency import spans
+
+BLUR_RADIUS    = 22
+BLUR_SCALE     = 4
+TINT_ALPHA     = 120
+
+class DesktopBlur:
+    def __init__(self, radius=BLUR_RADIUS, scale=BLUR_SCALE, tint=TINT_ALPHA):
+        self._scale  = scale
+        self._radius = radius / scale
+        # Compositing black at alpha `tint` over an opaque pixel is a per-channel scale
+        keep         = 1 - tint / 255
+        self._lut    = [int(v * keep + 0.5) for v in range(256)] * 4
+        self._key    = None
+        self._pixmap = None
+
+    # Stages are recorded as "blur.*" spans in the latency log
+    def capture(self, screen):
+        spans.begin("blur")
+        raw = screen.grabWindow(0).toImage()
+        spans.mark("blur", "grab")
+        return self._render(raw)
+
+    def render(self, raw: QImage):
+        spans.begin("blur")
+        return self._render(raw)
+
+    def _render(self, raw: QImage):
+        w, h  = raw.width(), raw.height()
+        small = raw.scaled(max(1, w // self._scale), max(1, h // self._scale),
+                           Qt.AspectRatioMode.IgnoreAspectRatio,
+                           Qt.TransformationMode.SmoothTransformation)
+        small = small.convertToFormat(QImage.Format.Format_RGBX8888)
+        spans.mark("blur", "downscale")
+
+        ptr = small.constBits()
+        ptr.setsize(small.sizeInBytes())
+        buf = memoryview(ptr)
+        key = (w, h, zlib.crc32(buf))
+        spans.mark("blur", "fingerprint")
+        if key == self._key and self._pixmap is not None:
+            spans.end("blur", "reused")
+            return self._pixmap
+
+        # Wraps the QImage memory directly; no encode/decode round trip
+        pil = Image.frombuffer("RGBX", (small.width(), small.height()), buf,
+                               "raw", "RGBX", small.bytesPerLine(), 1)
+        out = pil.filter(ImageFilter.GaussianBlur(self._radius)).point(self._lut)
+        spans.mark("blur", "blur_tint")
+
+        data = out.tobytes()
+        img  = QImage(data, out.width, out.height, out.width * 4, QImage.Format.Format_RGBX8888)
+        self._pixmap = QPixmap.fromImage(img.scaled(w, h,
+                                                    Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                    Qt.TransformationMode.SmoothTransformation))
+        self._key = key
+        spans.end("blur", "upscale")
+        return self._pixmap
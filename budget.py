@@ -0,0 +1,93 @@
+import heapq
+import os
+
+from clipitem import ClipItem
+
+MB = 1024 * 1024
+
+HISTORY_BUDGET = int(float(os.environ.get("CLIPVAULT_BUDGET_MB", 1024)) * MB)
+EVICTION       = os.environ.get("CLIPVAULT_EVICTION", "oldest")
+# Share of the budget one type may use before its own oldest entries go first
+TYPE_QUOTAS    = {"image": 0.8}
+
+def format_bytes(n: int):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.2f} GB"
+
+class HistoryBudget:
+    def __init__(self, limit=HISTORY_BUDGET, policy=EVICTION, quotas=TYPE_QUOTAS, max_items=None):
+        self.limit      = limit
+        self.policy     = policy
+        self._quotas    = {kind: int(share * limit) for kind, share in quotas.items()}
+        self._max_items = max_items
+        self._items     = {}
+        self._by_type   = {}
+        self._heap      = []
+        self.used       = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def usage(self, kind=None):
+        return self.used if kind is None else self._by_type.get(kind, 0)
+
+    def add(self, item: ClipItem):
+        if item.id in self._items:
+            self.remove(item)
+        self._items[item.id] = item
+        self._by_type[item.type] = self._by_type.get(item.type, 0) + item.size
+        self.used += item.size
+        if self.policy == "largest":
+            heapq.heappush(self._heap, (-item.size, item.id))
+
+    def remove(self, item: ClipItem):
+        if self._items.pop(item.id, None) is None:
+            return
+        self._by_type[item.type] -= item.size
+        self.used -= item.size
+        # Stale heap entries are skipped lazily; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._items) + 64:
+            self._heap = [(-it.size, i) for i, it in self._items.items()]
+            heapq.heapify(self._heap)
+
+    def clear(self):
+        self._items.clear()
+        self._by_type.clear()
+        self._heap.clear()
+        self.used = 0
+
+    def over(self):
+        return self.used > self.limit
+
+    # Next entry to evict from history (a ClipHistory), or None when within
+    # budget; the newest entry is never chosen
+    def victim(self, history):
+        if len(history) < 2:
+            return None
+        if self._max_items is not None and len(history) > self._max_items:
+            return history[-1]
+        for kind, quota in self._quotas.items():
+            if self._by_type.get(kind, 0) > quota:
+                item = history.oldest(kind)
+                if item is not None and item is not history[0]:
+                    return item
+        if not self.over():
+            return None
+        if self.policy == "largest":
+            item = self._largest()
+            if item is not None and item is not history[0]:
+                return item
+        return history[-1]
+
+    def _largest(self):
+        heap = self._heap
+        while heap:
+            size, item_id = heap[0]
+            item = self._items.get(item_id)
+            if item is not None and -size == item.size:
+                return item
+            heapq.heappop(heap)
+        return None
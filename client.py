@@ -0,0 +1,93 @@
+import base64
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# Talks to the IPC server of a running ClipVault (ipc.IpcServer) with the
+# standard library only, so a call costs a Python start and a round trip.
+#   python client.py recent [N] | search QUERY [N] | get N | paste N | stats
+# N is a position in history (0 is the newest); #ID names an entry by id.
+# --json prints the raw reply; get --out FILE saves an image as PNG
+
+# CLIPVAULT_IPC overrides the pipe name on both ends; it never disables
+# the server (CLIPVAULT_NO_IPC does, see main.py)
+def server_name():
+    user = os.environ.get("USERNAME") or os.environ.get("USER") or "user"
+    return os.environ.get("CLIPVAULT_IPC") or f"clipvault-{user}"
+
+# Qt's QLocalServer is a named pipe on Windows and a socket in the temp
+# directory elsewhere
+def _connect(name):
+    if sys.platform == "win32":
+        return open(rf"\\.\pipe\{name}", "r+b", buffering=0)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(os.path.join(tempfile.gettempdir(), name))
+    return sock.makefile("rwb", buffering=0)
+
+def request(cmd: str, **args):
+    with _connect(server_name()) as conn:
+        conn.write(json.dumps(dict(args, cmd=cmd)).encode("utf-8") + b"\n")
+        line = conn.readline()
+    if not line:
+        raise ConnectionError("no reply")
+    return json.loads(line)
+
+def _ref(arg: str):
+    return {"id": int(arg[1:])} if arg.startswith("#") else {"index": int(arg)}
+
+def _row(entry):
+    return f"{entry['index']:>5}  #{entry['id']:<8} {entry['type']:<6} {entry['label']}"
+
+def main(argv):
+    raw = "--json" in argv
+    argv = [a for a in argv if a != "--json"]
+    out = None
+    if "--out" in argv:
+        at  = argv.index("--out")
+        out = argv[at + 1]
+        del argv[at:at + 2]
+    if not argv:
+        sys.exit("usage: client.py recent [N] | search QUERY [N] | get N | paste N | stats [--json]")
+    cmd, rest = argv[0], argv[1:]
+    if cmd == "recent":
+        args = {"limit": int(rest[0]) if rest else 20}
+    elif cmd == "search" and rest:
+        args = {"query": rest[0], "limit": int(rest[1]) if len(rest) > 1 else 20}
+    elif cmd in ("get", "paste") and rest:
+        args = _ref(rest[0])
+        if cmd == "get" and out:
+            args["image"] = True
+    elif cmd == "stats":
+        args = {}
+    else:
+        sys.exit(f"unknown command: {' '.join(argv)}")
+
+    try:
+        reply = request(cmd, **args)
+    except (OSError, ConnectionError, ValueError) as e:
+        sys.exit(f"ClipVault is not reachable: {e}")
+    if not reply.get("ok"):
+        sys.exit(reply.get("error", "request failed"))
+    # Stored text may hold lone surrogates, which stdout cannot encode
+    sys.stdout.reconfigure(errors="backslashreplace")
+    if raw:
+        print(json.dumps(reply, ensure_ascii=False, indent=1))
+    elif cmd in ("recent", "search"):
+        for entry in reply["items"]:
+            print(_row(entry))
+    elif cmd == "get":
+        entry = reply["item"]
+        if "text" in entry:
+            sys.stdout.write(entry["text"])
+        elif out and "png" in entry:
+            with open(out, "wb") as f:
+                f.write(base64.b64decode(entry["png"]))
+        else:
+            print(_row(entry))
+    elif cmd == "stats":
+        print(f"{reply['count']} items, {reply['used'] / 2**20:.1f} MB of {reply['limit'] / 2**20:.0f} MB")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
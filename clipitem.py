@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import dib as dibfmt
+
+LABEL_CHARS = 120
+# Lowercased keys longer than this are not kept once the payload is dropped;
+# the search index holds its own packed copy (search.PACK_MIN)
+KEY_CACHE_MAX = 4 * 1024
+
+def text_stats(text: str):
+    return len(text), len(text.split()), text.count("\n") + 1
+
+class ClipItem:
+    __slots__ = ("id", "ts", "type", "text", "dib", "width", "height", "mode",
+                 "digest", "size", "pending", "phash", "versions",
+                 "_raw", "_image", "_label", "_stats", "_key")
+
+    def __init__(self, type, ts=None, text=None, dib=None, label=None, id=None,
+                 width=None, height=None, mode=None, digest=None, size=0):
+        self.id     = id
+        self.ts     = ts if ts is not None else datetime.now().timestamp()
+        self.type   = type
+        self.text   = text
+        # Raw CF_DIB bytes are the canonical image payload; pixels are decoded on demand
+        self.dib    = dib
+        if dib is not None and width is None:
+            width, height, mode = dibfmt.info(dib)
+        self.width  = width
+        self.height = height
+        self.mode   = mode
+        self.digest = digest
+        self.size   = size
+        # True while the ingest pipeline is still preparing the entry
+        self.pending = False
+        # Perceptual hash of an image (phash.dhash) and how many earlier
+        # near-identical captures are stacked under this one
+        self.phash    = None
+        self.versions = 0
+        self._raw   = None
+        self._image = None
+        self._label = label
+        self._stats = None
+        self._key   = None
+
+    @classmethod
+    def from_text(cls, text: str):
+        return cls("text", text=text)
+
+    @classmethod
+    def from_dib(cls, dib: bytes):
+        return cls("image", dib=dib)
+
+    # Defers packing the QImage into a DIB to materialise(), off the GUI thread
+    @classmethod
+    def from_qimage(cls, qimg):
+        item = cls("image", width=qimg.width(), height=qimg.height(),
+                   mode="RGBA" if qimg.hasAlphaChannel() else "RGB")
+        item._raw = qimg
+        return item
+
+    @classmethod
+    def from_image(cls, image):
+        item = cls("image", dib=dibfmt.from_image(image))
+        item._image = image
+        return item
+
+    def __repr__(self):
+        return f"<ClipItem {self.id} {self.type} {self.label[:32]!r}>"
+
+    @property
+    def copied_at(self):
+        return datetime.fromtimestamp(self.ts)
+
+    @property
+    def label(self):
+        if self._label is None:
+            if self.type == "image":
+                self._label = f"Image  {self.width}×{self.height}"
+            elif self.text is not None:
+                self._label = self.text[:LABEL_CHARS].replace("\n", " ")
+            else:
+                return ""
+        return self._label
+
+    def materialise(self):
+        if self._raw is not None:
+            self.dib, self._raw = dibfmt.from_qimage(self._raw), None
+
+    @property
+    def image(self):
+        if self._image is None and self.dib is not None:
+            self._image = dibfmt.decode(self.dib)
+        return self._image
+
+    @property
+    def resident(self):
+        return (self.dib if self.type == "image" else self.text) is not None
+
+    # (chars, words, lines) once measure() has run; it is linear in the text,
+    # so the ingest pool and the preview call it off the GUI thread
+    @property
+    def stats(self):
+        return self._stats
+
+    def measure(self, text: str):
+        if self._stats is None:
+            self._stats = text_stats(text)
+        return self._stats
+
+    @property
+    def search_key(self):
+        if self._key is None:
+            if self.type != "text":
+                self._key = self.label.lower()
+            elif self.text is not None:
+                self._key = self.text.lower()
+        return self._key
+
+    def copy(self, **payload):
+        dup = ClipItem(self.type, self.ts, self.text, self.dib, self._label, self.id,
+                       self.width, self.height, self.mode, self.digest, self.size)
+        dup._image = self._image
+        dup._stats = self._stats
+        dup._key   = self._key
+        dup.phash    = self.phash
+        dup.versions = self.versions
+        for name, value in payload.items():
+            setattr(dup, name, value)
+        return dup
+
+    def drop_payload(self):
+        if self.text is not None:
+            self.label
+        self.text   = None
+        self.dib    = None
+        self._raw   = None
+        self._image = None
+        if self._key is not None and len(self._key) > KEY_CACHE_MAX:
+            self._key = None
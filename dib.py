@@ -0,0 +1,81 @@
+import io
+import struct
+
+from PyQt6.QtGui import QImage
+
+# CF_DIB payloads: a BITMAPINFOHEADER (or a later version) followed by the
+# pixels, exactly what the clipboard hands out and takes back
+BI_RGB       = 0
+BI_BITFIELDS = 3
+LCS_SRGB     = 0x73524742
+V5_SIZE      = 124
+
+def info(dib) -> tuple:
+    size = struct.unpack_from("<I", dib, 0)[0]
+    if size == 12:
+        width, height, _, bits = struct.unpack_from("<HHHH", dib, 4)
+        return width, height, "P" if bits <= 8 else "RGB"
+    width, height, _, bits, compression = struct.unpack_from("<iiHHI", dib, 4)
+    alpha = 0
+    if size >= 56:
+        alpha = struct.unpack_from("<I", dib, 52)[0]
+    if bits <= 8:
+        mode = "P"
+    elif bits == 32 and compression == BI_BITFIELDS and alpha:
+        mode = "RGBA"
+    else:
+        mode = "RGB"
+    return width, abs(height), mode
+
+# PIL is imported on first decode so capturing and sizing DIBs at startup
+# does not pay for it
+def decode(dib):
+    from PIL import Image
+    img = Image.open(io.BytesIO(dib), formats=["DIB"])
+    img.load()
+    return img
+
+def _v5_header(width, height, image_size):
+    return struct.pack(
+        "<IiiHHIIiiII4I I36x3I4I",
+        V5_SIZE, width, height, 1, 32, BI_BITFIELDS, image_size, 2835, 2835, 0, 0,
+        0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000,
+        LCS_SRGB, 0, 0, 0, 4, 0, 0, 0)
+
+def has_v5_header(dib) -> bool:
+    return struct.unpack_from("<I", dib, 0)[0] == V5_SIZE
+
+# The same DIB under a plain BITMAPINFOHEADER, for CF_DIB readers when the
+# payload carries a later header (BITMAPV5HEADER for alpha). BI_BITFIELDS
+# masks move from inside the header to right after it
+def to_info(dib) -> bytes:
+    size = struct.unpack_from("<I", dib, 0)[0]
+    if size <= 40:
+        return dib
+    compression = struct.unpack_from("<I", dib, 16)[0]
+    masks = dib[40:52] if compression == BI_BITFIELDS else b""
+    return struct.pack("<I", 40) + dib[4:40] + masks + dib[size:]
+
+def from_image(img) -> bytes:
+    w, h = img.size
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        pixels = img.convert("RGBA").tobytes("raw", ("BGRA", w * 4, -1))
+        return _v5_header(w, h, len(pixels)) + pixels
+    stride = (w * 3 + 3) & ~3
+    pixels = img.convert("RGB").tobytes("raw", ("BGR", stride, -1))
+    header = struct.pack("<IiiHHIIiiII", 40, w, h, 1, 24, BI_RGB, len(pixels), 2835, 2835, 0, 0)
+    return header + pixels
+
+def from_qimage(qimg: QImage) -> bytes:
+    alpha = qimg.hasAlphaChannel()
+    # ARGB32 is BGRA in memory on little-endian Windows; DIBs run bottom-up
+    qimg  = qimg.convertToFormat(QImage.Format.Format_ARGB32 if alpha
+                                 else QImage.Format.Format_RGB32).mirrored(False, True)
+    w, h  = qimg.width(), qimg.height()
+    ptr   = qimg.constBits()
+    ptr.setsize(qimg.sizeInBytes())
+    pixels = bytes(ptr)
+    if alpha:
+        return _v5_header(w, h, len(pixels)) + pixels
+    header = struct.pack("<IiiHHIIiiII", 40, w, h, 1, 32, BI_RGB, len(pixels), 2835, 2835, 0, 0)
+    return header + pixels
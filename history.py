@@ -0,0 +1,154 @@
+import heapq
+from bisect import bisect_left
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from clipitem import ClipItem
+
+# Newest-first list of entries that reports every change, so views can
+# apply the delta instead of rebuilding. Every entry carries an order key
+# that grows towards the end of the list (new entries take keys below the
+# front or above the back), so positions and the oldest entry of a type
+# are found without scanning
+class ClipHistory(QObject):
+    inserted = pyqtSignal(int, object)
+    removed  = pyqtSignal(int, object)
+    moved    = pyqtSignal(int, int, object)
+    appended = pyqtSignal(int, int)
+    reset    = pyqtSignal()
+
+    def __init__(self, items=None):
+        super().__init__()
+        self._items = []
+        self._order = []
+        self._keys  = {}
+        self._ids   = set()
+        self._front = 0
+        self._back  = -1
+        # Per type, (-key, id(item), item) of its entries oldest first;
+        # entries that left or moved are skipped lazily
+        self._oldest = {}
+        self._stale  = 0
+        self._append(list(items or ()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __getitem__(self, pos):
+        return self._items[pos]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
+
+    def snapshot(self):
+        return list(self._items)
+
+    # Entries are looked up by identity; raises ValueError like list.index
+    def index(self, item: ClipItem):
+        key = self._keys.get(id(item))
+        if key is not None:
+            pos = bisect_left(self._order, key)
+            if pos < len(self._items) and self._items[pos] is item:
+                return pos
+        raise ValueError(f"{item!r} is not in history")
+
+    def has_id(self, item_id: int):
+        return item_id in self._ids
+
+    # Oldest entry of the given type, or None
+    def oldest(self, kind: str):
+        heap = self._oldest.get(kind)
+        while heap:
+            key, ref, item = heap[0]
+            if self._keys.get(ref) == -key:
+                return item
+            heapq.heappop(heap)
+            self._stale -= 1
+        return None
+
+    def insert(self, pos: int, item: ClipItem):
+        self._items.insert(pos, item)
+        self._ids.add(item.id)
+        self._place(pos, item)
+        self.inserted.emit(pos, item)
+
+    def pop(self, pos: int = -1):
+        if pos < 0:
+            pos += len(self._items)
+        item = self._items.pop(pos)
+        del self._order[pos]
+        del self._keys[id(item)]
+        self._ids.discard(item.id)
+        self._stale += 1
+        self.removed.emit(pos, item)
+        return item
+
+    def move(self, src: int, dst: int):
+        if src == dst:
+            return
+        item = self._items.pop(src)
+        del self._order[src]
+        self._items.insert(dst, item)
+        self._stale += 1
+        self._place(dst, item)
+        self.moved.emit(src, dst, item)
+
+    def extend(self, items: list):
+        if not items:
+            return
+        start = len(self._items)
+        self._append(items)
+        self.appended.emit(start, len(items))
+
+    def clear(self):
+        self._items.clear()
+        self._order.clear()
+        self._keys.clear()
+        self._ids.clear()
+        self._oldest.clear()
+        self._front, self._back, self._stale = 0, -1, 0
+        self.reset.emit()
+
+    def _append(self, items: list):
+        first = self._back + 1
+        self._items.extend(items)
+        self._ids.update(item.id for item in items)
+        self._order.extend(range(first, first + len(items)))
+        self._back += len(items)
+        for key, item in enumerate(items, first):
+            self._track(key, item)
+
+    # Keys the entry just placed at pos; one landing mid-list renumbers all
+    def _place(self, pos: int, item: ClipItem):
+        if pos == 0:
+            self._front -= 1
+            key = self._front
+        elif pos == len(self._items) - 1:
+            self._back += 1
+            key = self._back
+        else:
+            self._order.insert(pos, None)
+            self._renumber()
+            return
+        self._order.insert(pos, key)
+        self._track(key, item)
+        if self._stale > len(self._items) + 64:
+            self._renumber()
+
+    def _track(self, key: int, item: ClipItem):
+        self._keys[id(item)] = key
+        heapq.heappush(self._oldest.setdefault(item.type, []), (-key, id(item), item))
+
+    def _renumber(self):
+        self._order = list(range(len(self._items)))
+        self._keys.clear()
+        self._oldest.clear()
+        self._front, self._back, self._stale = 0, len(self._items) - 1, 0
+        for key, item in enumerate(self._items):
+            self._track(key, item)
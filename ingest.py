@@ -0,0 +1,47 @@
+from PyQt6.QtCore import QObject, QThreadPool, pyqtSignal
+
+from clipitem import ClipItem
+from phash import dhash
+from search import FuzzyIndex
+from store import fingerprint, item_size
+from widgets import scaled_image, THUMB_SIZE
+
+INGEST_WORKERS = 2
+
+class IngestPipeline(QObject):
+    # (item, thumbnail QImage or None) once the entry is ready to render
+    ready  = pyqtSignal(object, object)
+    failed = pyqtSignal(object)
+
+    def __init__(self, index: FuzzyIndex, workers=INGEST_WORKERS):
+        super().__init__()
+        self._index = index
+        self._pool  = QThreadPool()
+        self._pool.setMaxThreadCount(workers)
+
+    def submit(self, item: ClipItem):
+        item.pending = True
+        self._pool.start(lambda: self._run(item))
+
+    # Stages: read, fingerprint, decode, thumbnail and phash (or text stats), index
+    def _run(self, item: ClipItem):
+        thumb = None
+        try:
+            item.materialise()
+            item.digest = fingerprint(item)
+            item.size   = item_size(item)
+            if item.type == "image":
+                thumb = scaled_image(item.image, *THUMB_SIZE)
+                item.phash = dhash(item.image)
+            else:
+                item.measure(item.text)
+            item.label
+            self._index.add(item.id, item.search_key)
+        except Exception as e:
+            print(f"[IngestPipeline] {item!r} failed: {e}")
+            self.failed.emit(item)
+            return
+        self.ready.emit(item, thumb)
+
+    def shutdown(self, ms=2000):
+        return self._pool.waitForDone(ms)
@@ -0,0 +1,147 @@
+import base64
+import io
+import json
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+from client import server_name
+
+MAX_REQUEST = 64 * 1024
+MAX_LIMIT   = 500
+
+class IpcError(Exception):
+    pass
+
+def _entry(item, index):
+    return {"index": index, "id": item.id, "ts": item.ts, "type": item.type,
+            "label": item.label, "size": item.size, "versions": item.versions,
+            "width": item.width, "height": item.height}
+
+# One client connection: newline-delimited JSON requests, one reply line each
+class _Session(QObject):
+    def __init__(self, server, sock: QLocalSocket):
+        super().__init__(sock)
+        self._server = server
+        self._sock   = sock
+        self._buf    = b""
+        sock.readyRead.connect(self._on_ready)
+        sock.disconnected.connect(sock.deleteLater)
+
+    def _on_ready(self):
+        self._buf += bytes(self._sock.readAll())
+        while b"\n" in self._buf:
+            line, self._buf = self._buf.split(b"\n", 1)
+            self._reply(self._server.handle(line))
+        if len(self._buf) > MAX_REQUEST:
+            self._reply({"ok": False, "error": "request too long"})
+            self._sock.disconnectFromServer()
+
+    # Lone surrogates in stored text come out as \udXXX escapes; anything
+    # else that fails is answered rather than raised out of the slot
+    def _reply(self, reply):
+        try:
+            line = json.dumps(reply).encode("ascii")
+        except (TypeError, ValueError) as e:
+            print(f"[IpcServer] reply failed: {e}")
+            line = json.dumps({"ok": False, "error": "internal error"}).encode("ascii")
+        self._sock.write(line + b"\n")
+        self._sock.flush()
+
+# Serves history queries to local clients (client.py) from its own thread
+# and event loop, so the GUI thread only ever sees paste requests. source
+# is the overlay; recent/search/find/resolve/usage are safe off its thread
+class IpcServer(QThread):
+    paste_requested = pyqtSignal(object)
+
+    def __init__(self, source, name=None):
+        super().__init__()
+        self._source = source
+        self._name   = name or server_name()
+
+    def run(self):
+        server = QLocalServer()
+        server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        if not server.listen(self._name):
+            # A socket file left by a crashed instance; a live one answers
+            probe = QLocalSocket()
+            probe.connectToServer(self._name)
+            if probe.waitForConnected(200):
+                print(f"[IpcServer] {self._name} is served by another instance")
+                return
+            QLocalServer.removeServer(self._name)
+            if not server.listen(self._name):
+                print(f"[IpcServer] listen on {self._name} failed: {server.errorString()}")
+                return
+        server.newConnection.connect(lambda: self._accept(server))
+        self.exec()
+        server.close()
+        self._source.release_store()
+
+    def _accept(self, server):
+        while server.hasPendingConnections():
+            _Session(self, server.nextPendingConnection())
+
+    def handle(self, line: bytes):
+        try:
+            req = json.loads(line)
+            cmd = req.get("cmd")
+            handler = getattr(self, f"_cmd_{cmd}", None) if isinstance(cmd, str) else None
+            if handler is None:
+                raise IpcError(f"unknown command {cmd!r}")
+            reply = handler(req)
+        except IpcError as e:
+            return {"ok": False, "error": str(e)}
+        except (ValueError, TypeError, AttributeError) as e:
+            return {"ok": False, "error": f"bad request: {e}"}
+        except Exception as e:
+            print(f"[IpcServer] {line[:80]!r} failed: {e}")
+            return {"ok": False, "error": "internal error"}
+        reply["ok"] = True
+        return reply
+
+    def _limit(self, req, default=20):
+        return max(0, min(int(req.get("limit", default)), MAX_LIMIT))
+
+    def _lookup(self, req):
+        if "id" in req:
+            found = self._source.find(int(req["id"]))
+        else:
+            found = self._source.at(int(req.get("index", 0)))
+        if found is None:
+            raise IpcError("no such entry")
+        return found
+
+    def _cmd_recent(self, req):
+        found = self._source.recent(self._limit(req))
+        return {"items": [_entry(item, index) for index, item in found]}
+
+    def _cmd_search(self, req):
+        found = self._source.search(str(req.get("query", "")), self._limit(req))
+        return {"items": [_entry(item, index) for index, item in found]}
+
+    def _cmd_get(self, req):
+        index, item = self._lookup(req)
+        entry = _entry(item, index)
+        full  = self._source.resolve(item)
+        if full is None:
+            raise IpcError("entry is gone from the store")
+        if full.type == "text":
+            entry["text"] = full.text
+        elif req.get("image"):
+            out = io.BytesIO()
+            full.image.save(out, "PNG")
+            entry["png"] = base64.b64encode(out.getvalue()).decode("ascii")
+        return {"item": entry}
+
+    def _cmd_paste(self, req):
+        index, item = self._lookup(req)
+        self.paste_requested.emit(item)
+        return {"item": _entry(item, index)}
+
+    def _cmd_stats(self, req):
+        count, used, limit = self._source.usage()
+        return {"count": count, "used": used, "limit": limit}
+
+    def stop(self):
+        self.quit()
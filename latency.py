@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from array import array
+
+RING_SIZE      = 512
+PERCENTILES    = (50, 90, 99)
+REPORT_TIMINGS = bool(os.environ.get("CLIPVAULT_TIMINGS"))
+
+# Fixed-size buffer of the most recent samples, in milliseconds
+class Ring:
+    def __init__(self, size=RING_SIZE):
+        self._buf  = array("d", bytes(8 * size))
+        self._pos  = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self._buf[self._pos] = value
+        self._pos = (self._pos + 1) % len(self._buf)
+        self.count += 1
+
+    def values(self):
+        if self.count < len(self._buf):
+            return self._buf[:self._pos].tolist()
+        return (self._buf[self._pos:] + self._buf[:self._pos]).tolist()
+
+def _percentile(ordered: list, p: int):
+    return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+# Named traces ("show", "paste") split into stages; each stage becomes a
+# "trace.stage" span and the whole trace a "trace.total" span
+class LatencyLog:
+    def __init__(self, size=RING_SIZE):
+        self._size  = size
+        self._rings = {}
+        self._open  = {}
+        self._lock  = threading.Lock()
+
+    # t0 (perf_counter_ns) backdates the start, e.g. to when the OS queued the hotkey
+    def begin(self, trace: str, t0=None):
+        t0 = time.perf_counter_ns() if t0 is None else t0
+        with self._lock:
+            self._open[trace] = [t0, t0, []]
+
+    # Closes the stage since the previous mark; starts the trace if none is open
+    def mark(self, trace: str, stage: str):
+        now = time.perf_counter_ns()
+        with self._lock:
+            state = self._open.get(trace)
+            if state is None:
+                self._open[trace] = state = [now, now, []]
+            ms = (now - state[1]) / 1e6
+            state[1] = now
+            state[2].append((stage, ms))
+            self._add(f"{trace}.{stage}", ms)
+
+    def end(self, trace: str, stage: str = None):
+        if stage is not None:
+            self.mark(trace, stage)
+        now = time.perf_counter_ns()
+        with self._lock:
+            state = self._open.pop(trace, None)
+            if state is None:
+                return None
+            total = ((now if stage is None else state[1]) - state[0]) / 1e6
+            self._add(f"{trace}.total", total)
+        if REPORT_TIMINGS:
+            stages = "  ".join(f"{name} {ms:.1f}" for name, ms in state[2])
+            print(f"[LatencyLog] {trace} {total:.1f} ms" + (f": {stages}" if stages else ""))
+        return total
+
+    def cancel(self, trace: str):
+        with self._lock:
+            self._open.pop(trace, None)
+
+    def active(self, trace: str):
+        return trace in self._open
+
+    def record(self, span: str, ms: float):
+        with self._lock:
+            self._add(span, ms)
+
+    def _add(self, span, ms):
+        ring = self._rings.get(span)
+        if ring is None:
+            ring = self._rings[span] = Ring(self._size)
+        ring.add(ms)
+
+    def summary(self):
+        with self._lock:
+            rings = {span: (ring.count, ring.values()) for span, ring in self._rings.items()}
+        out = {}
+        for span, (count, values) in rings.items():
+            ordered = sorted(values)
+            stats = {"count": count, "kept": len(ordered),
+                     "mean": sum(ordered) / len(ordered), "max": ordered[-1]}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = _percentile(ordered, p)
+            out[span] = stats
+        return out
+
+    def export(self, path: str):
+        # Imported here; main loads this module before anything else
+        import platform
+        with self._lock:
+            samples = {span: ring.values() for span, ring in self._rings.items()}
+        data = {
+            "exported": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "platform": platform.platform(),
+            "python":   platform.python_version(),
+            "summary":  self.summary(),
+            "samples":  samples,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._open.clear()
+
+# Process-wide log shared by the hotkey thread, the overlay and the paste helpers
+spans = LatencyLog()
@@ -1,70 +1,252 @@
+import importlib
+import os
 import sys
-from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
+import time
+
+from latency import spans
+spans.begin("startup")
+
+from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QFileDialog
 from PyQt6.QtGui import QAction, QFont
+from PyQt6.QtCore import QTimer
 
 app = QApplication(sys.argv)
 
 app.setFont(QFont("Inter", 10))
+spans.mark("startup", "qt")
+
+# Only what the tray, the hotkey and the clipboard source need; the overlay,
+# the store and PIL are imported when the overlay is first built
+from backend import make_clipboard_source, HotkeyThread, INSTANT_PASTE
+from budget import format_bytes
+spans.mark("startup", "imports")
 
-from overlay import FullscreenOverlay
-from backend import ClipboardWatcher, HotkeyThread
+# Delay before the overlay is built in the background once the tray is up
+PREWARM_MS     = 200
+# Set to print where startup time went; "exit" also quits once warm
+STARTUP_REPORT = os.environ.get("CLIPVAULT_STARTUP", "")
 
 class TrayApp(QSystemTrayIcon):
-    def __init__(self, app, overlay: FullscreenOverlay):
+    def __init__(self, app, make_overlay):
         super().__init__()
         self.app     = app
-        self.overlay = overlay
+        self.overlay = None
+        self.ipc     = None
+        self._make_overlay = make_overlay
 
         self.setIcon(app.style().standardIcon(
             app.style().StandardPixmap.SP_FileIcon))
-        self.setToolTip("ClipVault — Clipboard History  (Ctrl+Shift+Q)")
 
         menu = QMenu()
+        self._usage_a = QAction("Loading history…")
+        self._usage_a.setEnabled(False)
+        menu.addAction(self._usage_a)
+        menu.addSeparator()
+
         show_a = QAction("Open ClipVault  (Ctrl+Shift+Q)")
-        show_a.triggered.connect(overlay.fade_in)
+        show_a.triggered.connect(lambda: self.get_overlay().fade_in())
         menu.addAction(show_a)
         menu.addSeparator()
-        
+
+        self._instant_a = QAction("Instant paste")
+        self._instant_a.setCheckable(True)
+        self._instant_a.setChecked(INSTANT_PASTE)
+        self._instant_a.toggled.connect(self._set_instant)
+        menu.addAction(self._instant_a)
+
+        self._latency_m = QMenu("Latency")
+        self._latency_m.aboutToShow.connect(self._fill_latency)
+        menu.addMenu(self._latency_m)
+        menu.addSeparator()
+
+        export_a = QAction("Export History…")
+        export_a.triggered.connect(self._export_history)
+        menu.addAction(export_a)
+        import_a = QAction("Import History…")
+        import_a.triggered.connect(self._import_history)
+        menu.addAction(import_a)
+
         clr_a = QAction("Clear History")
-        clr_a.triggered.connect(overlay._clear_all)
+        clr_a.triggered.connect(lambda: self.get_overlay()._clear_all())
         menu.addAction(clr_a)
         menu.addSeparator()
-        
+
         quit_a = QAction("Quit")
-        quit_a.triggered.connect(overlay._quit)
+        quit_a.triggered.connect(lambda: self._quit())
         menu.addAction(quit_a)
 
         self.setContextMenu(menu)
         self.activated.connect(self._click)
+        self.setToolTip("ClipVault — Clipboard History  (Ctrl+Shift+Q)")
         self.show()
 
+    # Builds the overlay on first use if the idle pre-warm has not yet
+    def get_overlay(self):
+        if self.overlay is None:
+            self.overlay = self._make_overlay()
+            self.overlay.usage_changed.connect(self._on_usage)
+            self.overlay.archive_progress.connect(self._on_archive_progress)
+            self.overlay.archive_done.connect(self._on_archive_done)
+            self.overlay.set_instant_paste(self._instant_a.isChecked())
+            self._start_ipc()
+            self._on_usage(*self.overlay.usage())
+        return self.overlay
+
+    # Scripts reach history through client.py once the overlay exists;
+    # CLIPVAULT_NO_IPC=1 turns the server off; CLIPVAULT_IPC names it
+    def _start_ipc(self):
+        if os.environ.get("CLIPVAULT_NO_IPC"):
+            return
+        from ipc import IpcServer
+        self.ipc = IpcServer(self.overlay)
+        self.ipc.paste_requested.connect(self.overlay.paste_item)
+        self.ipc.start()
+
+    def prewarm(self):
+        overlay = self.get_overlay()
+        # The UI is the larger half; give the event loop a turn in between
+        QTimer.singleShot(0, lambda: self._prewarm_ui(overlay))
+
+    def _prewarm_ui(self, overlay):
+        spans.begin("prewarm")
+        overlay.ensure_ui()
+        spans.end("prewarm", "ui")
+        if STARTUP_REPORT:
+            report_startup()
+            if STARTUP_REPORT == "exit":
+                self._quit()
+
+    def _quit(self):
+        self.app.quit()
+
+    def _set_instant(self, instant: bool):
+        if self.overlay is not None:
+            self.overlay.set_instant_paste(instant)
+
+    def _on_usage(self, count, used, limit):
+        usage = f"{count} item{'s' if count != 1 else ''}  ·  {format_bytes(used)} / {format_bytes(limit)}"
+        self._usage_a.setText(usage)
+        self.setToolTip(f"ClipVault — Clipboard History  (Ctrl+Shift+Q)\n{usage}")
+
+    # One disabled row per span, rebuilt each time the submenu opens
+    def _fill_latency(self):
+        m = self._latency_m
+        m.clear()
+        summary = spans.summary()
+        if not summary:
+            m.addAction("No samples yet").setEnabled(False)
+        for span, s in summary.items():
+            m.addAction(f"{span}   p50 {s['p50']:.1f}  ·  p90 {s['p90']:.1f}  ·  "
+                        f"p99 {s['p99']:.1f} ms   ({s['count']})").setEnabled(False)
+        m.addSeparator()
+        m.addAction("Export as JSON…").triggered.connect(self._export_latency)
+        m.addAction("Reset").triggered.connect(spans.clear)
+
+    def _export_latency(self):
+        default = os.path.join(os.path.expanduser("~"),
+                               time.strftime("clipvault-latency-%Y%m%d-%H%M%S.json"))
+        path, _ = QFileDialog.getSaveFileName(None, "Export latency", default, "JSON (*.json)")
+        if not path:
+            return
+        try:
+            spans.export(path)
+        except OSError as e:
+            print(f"[TrayApp] latency export failed: {e}")
+
+    def _export_history(self):
+        default = os.path.join(os.path.expanduser("~"),
+                               time.strftime("clipvault-%Y%m%d-%H%M%S.clipvault"))
+        path, _ = QFileDialog.getSaveFileName(None, "Export history", default,
+                                              "ClipVault archive (*.clipvault)")
+        if path and not self.get_overlay().export_history(path):
+            self.showMessage("ClipVault", "An export or import is already running")
+
+    def _import_history(self):
+        path, _ = QFileDialog.getOpenFileName(None, "Import history", os.path.expanduser("~"),
+                                              "ClipVault archive (*.clipvault)")
+        if path and not self.get_overlay().import_history(path):
+            self.showMessage("ClipVault", "An export or import is already running")
+
+    def _on_archive_progress(self, op, done, total):
+        verb = "Exporting" if op == "export" else "Importing"
+        self._usage_a.setText(f"{verb} history…  {100 * done // max(total, 1)}%")
+
+    def _on_archive_done(self, ok, message):
+        self._on_usage(*self.overlay.usage())
+        self.showMessage("ClipVault", message,
+                         QSystemTrayIcon.MessageIcon.Information if ok else
+                         QSystemTrayIcon.MessageIcon.Warning)
+
     def _click(self, reason):
         if reason == QSystemTrayIcon.ActivationReason.Trigger:
-            self.overlay.toggle_visibility()
+            self.get_overlay().toggle_visibility()
+
+
+# Modules loaded by the time the tray was up, for the startup report
+tray_modules = set()
+
+def report_startup():
+    summary = spans.summary()
+    for trace in ("startup", "overlay", "prewarm"):
+        rows = [(span.split(".", 1)[1], s["max"]) for span, s in summary.items()
+                if span.startswith(trace + ".")]
+        print(f"[Startup] {trace}: " + "  ".join(f"{stage} {ms:.1f} ms" for stage, ms in rows))
+    deferred = sorted({name.split(".")[0] for name in set(sys.modules) - tray_modules})
+    print(f"[Startup] {len(tray_modules)} modules before the tray, "
+          f"{len(sys.modules) - len(tray_modules)} deferred: {', '.join(deferred)}")
 
 
 if __name__ == "__main__":
     app.setQuitOnLastWindowClosed(False)
 
-    overlay = FullscreenOverlay()
-    
-    watcher = ClipboardWatcher()
-    watcher.new_item.connect(overlay.add_item)
+    # Captures that land before the overlay exists wait here
+    pending = []
+    def hold(item):
+        pending.append(item)
+
+    watcher = make_clipboard_source()
+    watcher.new_item.connect(hold)
     watcher.start()
 
     hotkey = HotkeyThread()
-    hotkey.triggered.connect(overlay.toggle_visibility)
     hotkey.start()
-
-    tray = TrayApp(app, overlay)
+    spans.mark("startup", "sources")
+
+    def build_overlay():
+        spans.begin("overlay")
+        importlib.import_module("PIL.Image")
+        spans.mark("overlay", "pil")
+        from overlay import FullscreenOverlay
+        from store import HistoryStore
+        spans.mark("overlay", "import")
+        overlay = FullscreenOverlay(HistoryStore())
+        watcher.new_item.disconnect(hold)
+        watcher.new_item.connect(overlay.add_item)
+        for item in pending:
+            overlay.add_item(item)
+        pending.clear()
+        overlay._quit = _quit
+        spans.end("overlay", "construct")
+        return overlay
+
+    tray = TrayApp(app, build_overlay)
+    hotkey.triggered.connect(lambda: tray.get_overlay().toggle_visibility())
+    spans.end("startup", "tray")
+    tray_modules.update(sys.modules)
 
     def _quit():
         watcher.stop()
         hotkey.stop()
         watcher.wait(400)
         hotkey.wait(400)
+        if tray.ipc is not None:
+            tray.ipc.stop()
+            tray.ipc.wait(400)
+        if tray.overlay is not None:
+            tray.overlay.shutdown()
         app.quit()
 
-    overlay._quit = _quit
+    tray._quit = _quit
+    QTimer.singleShot(PREWARM_MS, tray.prewarm)
 
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
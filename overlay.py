@@ -1,23 +1,44 @@
-import io
+import time
 import win32gui
-from PIL import Image, ImageFilter, ImageQt
 
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QPushButton, QLineEdit, QScrollArea,
-    QGridLayout, QFrame
+    QLabel, QPushButton, QLineEdit
 )
 from PyQt6.QtGui import QColor, QPixmap, QPainter, QKeyEvent
 from PyQt6.QtCore import (
-    QTimer, Qt, QPropertyAnimation, QEasingCurve,
-    QBuffer, QByteArray, QIODevice
+    QTimer, Qt, QEvent, QModelIndex, QPropertyAnimation, QEasingCurve, pyqtSignal
 )
 
-from widgets import ClipCard, PreviewPanel
-from backend import paste_text, paste_image
+from widgets import (
+    ClipGrid, ClipGridModel, PreviewPanel, PixmapCache,
+    CARD_W, CARD_GAP, THUMB_SIZE
+)
+from backend import paste_text, paste_image, INSTANT_PASTE
+from blur import DesktopBlur
+from search import FuzzyIndex, SearchThread, TOP_K
+from store import (
+    HistoryStore, StoreWriter, HistoryLoader, FIRST_PAGE, MAX_HISTORY
+)
+from budget import HistoryBudget, format_bytes
+from ingest import IngestPipeline
+from clipitem import ClipItem
+from history import ClipHistory
+from archive import ArchiveThread
+from phash import PhashIndex
+from latency import spans
+
+SEARCH_DEBOUNCE_MS = 60
+EVICT_SLICE_MS     = 8
+PREFETCH_CARDS     = 48
 
 class FullscreenOverlay(QWidget):
-    def __init__(self):
+    usage_changed    = pyqtSignal(int, int, int)
+    # (op, done, total) and (ok, message) for a running export or import
+    archive_progress = pyqtSignal(str, int, int)
+    archive_done     = pyqtSignal(bool, str)
+
+    def __init__(self, store: HistoryStore = None):
         super().__init__()
 
         screen = QApplication.primaryScreen()
@@ -32,35 +53,78 @@ class FullscreenOverlay(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
 
-        self._history       = []
+        self._store         = store or HistoryStore()
+        self._history       = ClipHistory(self._store.page(FIRST_PAGE))
+        self._index         = FuzzyIndex(fetch=self._store.load_text)
+        self._by_digest     = {}
+        self._similar       = PhashIndex()
+        self._budget        = HistoryBudget(max_items=MAX_HISTORY)
+        self._pixmaps       = PixmapCache()
+        self._search_gen    = 0
         self._prev_hwnd     = None
         self._bg_pixmap     = None
+        self._blur          = DesktopBlur()
         self._anim          = None
-        self._visible_cards = []
+        self._instant_paste = INSTANT_PASTE
+        self._visible       = []
+        self._shown_query   = ""
         self._selected_idx  = None
         self._grid_cols     = 4
-
+        self._archive       = None
+
+        self._searcher = SearchThread(self._index)
+        self._searcher.results.connect(self._on_search_results)
+        self._searcher.start()
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self._filter)
+
+        self._writer = StoreWriter(self._store)
+        self._writer.committed.connect(self._on_committed)
+        self._writer.start()
+
+        self._ingest = IngestPipeline(self._index)
+        self._ingest.ready.connect(self._on_ingested)
+        self._ingest.failed.connect(self._on_ingest_failed)
+
+        self._evict_timer = QTimer(self)
+        self._evict_timer.setInterval(0)
+        self._evict_timer.timeout.connect(self._evict_step)
+
+        first_ids     = [it.id for it in self._history]
+        self._history = ClipHistory(self._register(self._history))
+        self._history.inserted.connect(self._on_history_inserted)
+        self._history.removed.connect(self._on_history_removed)
+        self._history.moved.connect(self._on_history_moved)
+        self._history.appended.connect(self._on_history_appended)
+        self._history.reset.connect(self._on_history_reset)
+
+        self._load_rest(first_ids)
+
+        self._ui_ready = False
+        self._refresh_usage()
+        if self._budget.victim(self._history) is not None:
+            self._evict_timer.start()
+
+    # The screen-sized UI and its stylesheet are built on first show, or
+    # earlier when main pre-warms the overlay on idle
+    def ensure_ui(self):
+        if self._ui_ready:
+            return
         self._build_ui()
         self._apply_style()
+        self.ensurePolished()
+        self.layout().activate()
+        self._ui_ready = True
+        # From here on the grid follows history while hidden, so opening
+        # never has to rebuild it
+        self._rebuild()
+        self._prefetch_thumbs()
 
     def _capture_desktop(self):
-        screen  = QApplication.primaryScreen()
-        raw_pix = screen.grabWindow(0)
-        raw_img = raw_pix.toImage()
-
-        ba   = QByteArray()
-        qbuf = QBuffer(ba)
-        qbuf.open(QIODevice.OpenModeFlag.WriteOnly)
-        raw_img.save(qbuf, "PNG")
-        qbuf.close()
-
-        pil      = Image.open(io.BytesIO(bytes(ba))).convert("RGB")
-        blurred  = pil.filter(ImageFilter.GaussianBlur(radius=22))
-        overlay  = Image.new("RGBA", blurred.size, (0, 0, 0, 120))
-        combined = Image.alpha_composite(blurred.convert("RGBA"), overlay)
-
-        qt_img          = ImageQt.ImageQt(combined)
-        self._bg_pixmap = QPixmap.fromImage(qt_img)
+        self._bg_pixmap = self._blur.capture(QApplication.primaryScreen())
 
     def paintEvent(self, event):
         painter = QPainter(self)
@@ -70,6 +134,8 @@ class FullscreenOverlay(QWidget):
         else:
             painter.fillRect(self.rect(), QColor(8, 10, 16, 230))
         painter.end()
+        if spans.active("show"):
+            spans.end("show", "first_frame")
 
     def _build_ui(self):
         root = QVBoxLayout(self)
@@ -123,7 +189,7 @@ class FullscreenOverlay(QWidget):
         self._search.setObjectName("search")
         self._search.setPlaceholderText("  ⌕   Search clipboard history…")
         self._search.setFixedHeight(44)
-        self._search.textChanged.connect(self._filter)
+        self._search.textChanged.connect(self._search_timer.start)
         self._search.installEventFilter(self)
         sl.addWidget(self._search)
 
@@ -155,27 +221,32 @@ class FullscreenOverlay(QWidget):
         self._section_lbl.setContentsMargins(40, 8, 0, 8)
         left_lay.addWidget(self._section_lbl)
 
-        scroll = QScrollArea()
-        scroll.setObjectName("scroll_area")
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        scroll.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        scroll.setFrameShape(QFrame.Shape.NoFrame)
-
         self._grid_container = QWidget()
         self._grid_container.setObjectName("grid_container")
-        self._grid_layout = QGridLayout(self._grid_container)
-        self._grid_layout.setContentsMargins(36, 0, 16, 36)
-        self._grid_layout.setSpacing(14)
-
-        scroll.setWidget(self._grid_container)
-        left_lay.addWidget(scroll, stretch=1)
+        gl = QVBoxLayout(self._grid_container)
+        gl.setContentsMargins(36, 0, 16, 36 - CARD_GAP)
+        gl.setSpacing(0)
+
+        self._model = ClipGridModel(self._grid_cols, self)
+        self._grid  = ClipGrid()
+        self._grid.setModel(self._model)
+        self._grid.pressed.connect(self._on_card_pressed)
+        self._grid.doubleClicked.connect(self._on_card_double_clicked)
+        self._grid.card_delegate().delete_requested.connect(self._on_card_delete)
+        self._grid.card_delegate().set_thumb_loader(self._store.load_thumb)
+        self._grid.card_delegate().set_pixmap_cache(self._pixmaps)
+        gl.addWidget(self._grid)
+
+        left_lay.addWidget(self._grid_container, stretch=1)
         content_lay.addWidget(left_wrap, stretch=1)
 
         # Right: preview panel
         self._preview_panel = PreviewPanel()
         self._preview_panel.setObjectName("preview_panel_outer")
         self._preview_panel.setFixedWidth(380)
+        self._preview_panel.set_resolver(self._store.resolve)
+        self._preview_panel.set_pixmap_cache(self._pixmaps)
+        self._preview_panel.set_version_loader(self._store.versions)
         self._preview_panel.paste_requested.connect(self._paste_item)
         self._preview_panel.plain_requested.connect(self._plain_item)
 
@@ -211,7 +282,6 @@ class FullscreenOverlay(QWidget):
         self._refresh_empty()
 
     def eventFilter(self, obj, event):
-        from PyQt6.QtCore import QEvent
         if obj is self._search and event.type() == QEvent.Type.KeyPress:
             k = event.key()
             if k == Qt.Key.Key_Escape:
@@ -246,7 +316,7 @@ class FullscreenOverlay(QWidget):
     def _handle_navigation(self, e: QKeyEvent):
         k    = e.key()
         mods = QApplication.keyboardModifiers()
-        if not self._visible_cards:
+        if not self._visible:
             return
 
         if self._selected_idx is None:
@@ -256,35 +326,45 @@ class FullscreenOverlay(QWidget):
         idx  = self._selected_idx
 
         if   k == Qt.Key.Key_Left:  idx = max(0, idx - 1)
-        elif k == Qt.Key.Key_Right: idx = min(len(self._visible_cards) - 1, idx + 1)
+        elif k == Qt.Key.Key_Right: idx = min(len(self._visible) - 1, idx + 1)
         elif k == Qt.Key.Key_Up:    idx = max(0, idx - cols)
-        elif k == Qt.Key.Key_Down:  idx = min(len(self._visible_cards) - 1, idx + cols)
+        elif k == Qt.Key.Key_Down:  idx = min(len(self._visible) - 1, idx + cols)
         elif k == Qt.Key.Key_Tab:
             if mods & Qt.KeyboardModifier.ShiftModifier:
                 idx = max(0, idx - 1)
             else:
-                idx = min(len(self._visible_cards) - 1, idx + 1)
+                idx = min(len(self._visible) - 1, idx + 1)
 
         if idx != self._selected_idx:
             self._selected_idx = idx
             self._select_card(idx)
 
-    def _select_card(self, card_index_in_list: int):
-        for c in self._visible_cards:
-            c.set_selected(False)
-        if 0 <= card_index_in_list < len(self._visible_cards):
-            card = self._visible_cards[card_index_in_list]
-            card.set_selected(True)
-            self._preview_panel.load(card.item)
+    def _select_card(self, card_index_in_list: int, scroll=True):
+        if 0 <= card_index_in_list < len(self._visible):
+            index = self._model.index_for(card_index_in_list)
+            self._set_current(index, scroll)
+            item = self._visible[card_index_in_list]
+            self._preview_panel.load(item, self._model.matches(item))
             self._show_preview_panel()
             self.setFocus()
+        else:
+            self._grid.clearSelection()
 
-    def _on_card_selected_by_click(self, history_index: int):
-        for vis_idx, card in enumerate(self._visible_cards):
-            if card.index == history_index:
-                self._selected_idx = vis_idx
-                self._select_card(vis_idx)
-                break
+    def _on_card_pressed(self, index):
+        pos = self._model.position(index)
+        if 0 <= pos < len(self._visible):
+            self._selected_idx = pos
+            self._select_card(pos)
+
+    def _on_card_double_clicked(self, index):
+        item = self._model.item_for(index)
+        if item is not None:
+            self._paste_item(item)
+
+    def _on_card_delete(self, item: ClipItem):
+        pos = self._position(item)
+        if pos is not None:
+            self._delete_item(pos)
 
     def _show_preview_panel(self):
         if self._preview_visible:
@@ -311,150 +391,599 @@ class FullscreenOverlay(QWidget):
         anim.start()
         self._preview_anim = anim
 
-    def add_item(self, item: dict):
-        if self._history:
-            last = self._history[0]
-            if last["type"] == item["type"] == "text" and last["text"] == item["text"]:
-                return
+    def _position(self, item: ClipItem):
+        try:
+            return self._history.index(item)
+        except ValueError:
+            return None
+
+    # Keeps the newest entry per fingerprint; older repeats are dropped for good
+    def _register(self, items: list):
+        kept = []
+        for item in items:
+            digest = item.digest
+            if digest is not None:
+                if digest in self._by_digest:
+                    self._index.remove(item.id)
+                    self._writer.delete(item.id)
+                    continue
+                self._by_digest[digest] = item
+            self._budget.add(item)
+            self._similar.add(item)
+            kept.append(item)
+        return kept
+
+    def _unregister(self, item: ClipItem):
+        digest = item.digest
+        if digest is not None and self._by_digest.get(digest) is item:
+            del self._by_digest[digest]
+        self._budget.remove(item)
+        self._similar.remove(item)
+
+    def _drop(self, pos: int):
+        item = self._history.pop(pos)
+        self._unregister(item)
+        self._index.remove(item.id)
+        self._pixmaps.discard(item.id)
+        self._writer.delete(item.id)
+        return item
+
+    # Evicts for at most EVICT_SLICE_MS per tick so a large overshoot never
+    # stalls the UI
+    def _evict_step(self):
+        evicted  = 0
+        deadline = time.perf_counter() + EVICT_SLICE_MS / 1000
+        while time.perf_counter() < deadline:
+            victim = self._budget.victim(self._history)
+            if victim is None:
+                self._evict_timer.stop()
+                break
+            pos = self._position(victim)
+            if pos is None:
+                self._budget.remove(victim)
+                continue
+            self._drop(pos)
+            evicted += 1
+        if evicted:
+            self._refresh_usage()
+
+    def usage(self):
+        return len(self._history), self._budget.usage(), self._budget.limit
+
+    # Read-only access for the IPC server, safe from its thread: history is
+    # only read through copies and the index and store are thread-safe.
+    # Entries come back as (position, item)
+    def recent(self, n: int):
+        return list(enumerate(self._history[:n]))
+
+    def at(self, index: int):
+        items = self._history.snapshot()
+        return (index, items[index]) if 0 <= index < len(items) else None
+
+    def find(self, item_id: int):
+        for n, item in enumerate(self._history.snapshot()):
+            if item.id == item_id:
+                return n, item
+        return None
+
+    def search(self, query: str, limit: int):
+        items  = self._history.snapshot()
+        ranked = self._index.rank(query, items, limit)
+        if not ranked:
+            return []
+        where = {item.id: n for n, item in enumerate(items)}
+        return [(where[item.id], item) for item, _ in ranked]
+
+    def resolve(self, item: ClipItem):
+        return self._store.resolve(item)
+
+    def release_store(self):
+        self._store.release()
+
+    def _refresh_usage(self):
+        total, used, limit = self.usage()
+        if self._ui_ready:
+            self._count_lbl.setText(
+                f"{total} item{'s' if total != 1 else ''}  ·  {format_bytes(used)} / {format_bytes(limit)}")
+        self.usage_changed.emit(total, used, limit)
+
+    def _move_to_front(self, item: ClipItem):
+        pos = self._position(item)
+        if pos is None:
+            return
+        item.ts = time.time()
+        self._history.move(pos, 0)
+        self._writer.touch(item.id, item.ts)
+
+    # The entry shows as a placeholder card until the ingest pipeline is done with it
+    def add_item(self, item: ClipItem):
+        item.id = self._store.next_id()
+        self._ingest.submit(item)
         self._history.insert(0, item)
-        if len(self._history) > 200:
-            self._history.pop()
+        self._refresh_usage()
+
+    def _on_ingested(self, item: ClipItem, thumb):
+        item.pending = False
+        pos = self._position(item)
+        if pos is None:
+            # Deleted or cleared while in flight
+            self._index.remove(item.id)
+            return
+        dup = self._by_digest.get(item.digest)
+        if dup is not None:
+            self._history.pop(pos)
+            self._index.remove(item.id)
+            self._move_to_front(dup)
+            self._refresh_usage()
+            return
+        if item.id not in self._index:
+            # Indexed before a reload cleared the index
+            self._index.add(item.id, item.search_key)
+        near = self._similar.nearest(item)
+        if near is not None:
+            self._fold(near, item)
+        self._by_digest[item.digest] = item
+        self._budget.add(item)
+        self._similar.add(item)
+        if thumb is not None:
+            self._pixmaps.put(item.id, THUMB_SIZE, QPixmap.fromImage(thumb))
+        self._writer.put(item)
+        if self._budget.victim(self._history) is not None:
+            self._evict_timer.start()
+        self._refresh_usage()
+        if self._grid_mode() == "filtered" and self._matches_query(item):
+            # Only now indexed and no longer pending, so a query can match it
+            self._search_timer.start()
         if self.isVisible():
-            self._rebuild_and_select(self._search.text(), select_idx=0)
-
-    def _rebuild(self, query=""):
-        while self._grid_layout.count():
-            child = self._grid_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        W    = self._screen_geo.width() - 380 
-        cols = max(2, (W - 80) // (240 + 14))
-        self._grid_cols     = cols
-        self._visible_cards = []
-
-        shown = 0
-        for i, item in enumerate(self._history):
-            if query and query.lower() not in item["label"].lower():
-                continue
-            card = ClipCard(item, i)
-            card.paste_sig.connect(self._paste_item)
-            card.plain_sig.connect(self._plain_item)
-            card.delete_sig.connect(self._delete_item)
-            card.selected_sig.connect(self._on_card_selected_by_click)
-            self._visible_cards.append(card)
-            self._grid_layout.addWidget(card, shown // cols, shown % cols)
-            shown += 1
-
-        if shown > 0:
-            remainder = shown % cols
-            if remainder:
-                for c in range(remainder, cols):
-                    sp = QWidget(); sp.setFixedSize(240, 130); sp.setObjectName("card_spacer")
-                    self._grid_layout.addWidget(sp, (shown - 1) // cols, c)
-
-        total = len(self._history)
-        self._count_lbl.setText(f"{total} item{'s' if total != 1 else ''}")
-        q = self._search.text()
+            self._grid.viewport().update()
+            if self._selected_idx is not None and self._visible[self._selected_idx] is item:
+                self._preview_panel.load(item)
+
+    # A near-identical earlier capture leaves the grid and goes on the new
+    # entry's version stack, kept scaled down in the store
+    def _fold(self, old: ClipItem, item: ClipItem):
+        pos = self._position(old)
+        if pos is None:
+            return
+        self._history.pop(pos)
+        self._unregister(old)
+        self._index.remove(old.id)
+        self._pixmaps.discard(old.id)
+        item.versions = old.versions + 1
+        self._writer.fold(old, item.id)
+
+    def _on_ingest_failed(self, item: ClipItem):
+        pos = self._position(item)
+        if pos is not None:
+            self._history.pop(pos)
+            self._refresh_usage()
+
+    def _on_committed(self, items: list):
+        # Persisted payloads are reloaded from the store on demand
+        for item in items:
+            item.drop_payload()
+
+    # Pages in the rest of the store and indexes all of it in the background
+    def _load_rest(self, skip_ids):
+        loader = HistoryLoader(self._store, self._index, skip_ids)
+        # Queued signals of a loader stopped for a reload must not land
+        loader.page_loaded.connect(lambda items: self._on_page_loaded(loader, items))
+        loader.finished.connect(lambda: self._on_loader_finished(loader))
+        self._loading = True
+        self._loader  = loader
+        loader.start()
+
+    def _stop_loading(self):
+        if self._loading:
+            self._loading = False
+            self._loader.stop()
+            self._loader.wait()
+
+    def _on_page_loaded(self, loader: HistoryLoader, items: list):
+        if not self._loading or loader is not self._loader:
+            return
+        # Captures committed before the loader read their page are live already
+        items = [item for item in items if not self._history.has_id(item.id)]
+        self._history.extend(self._register(items))
+        if self._budget.victim(self._history) is not None:
+            self._evict_timer.start()
+        self._refresh_usage()
+
+    def _on_loader_finished(self, loader: HistoryLoader):
+        if loader is self._loader:
+            self._loading = False
+
+    def _set_current(self, index, scroll=True):
+        # setCurrentIndex scrolls to the cell itself unless autoScroll is off
+        self._grid.setAutoScroll(scroll)
+        self._grid.setCurrentIndex(index)
+        self._grid.setAutoScroll(True)
+        if scroll:
+            self._grid.scrollTo(index)
+
+    # Keeps the selected card selected after the cells shift under it
+    def _follow_selection(self, pos: int):
+        self._selected_idx = pos
+        self._set_current(self._model.index_for(pos), scroll=False)
+
+    # History deltas. The unfiltered grid mirrors history position for
+    # position and applies them in place; a filtered grid re-runs its query
+    def _grid_mode(self):
+        if not self._ui_ready:
+            return None
+        return "filtered" if self._shown_query else "live"
+
+    # Entries the shown query cannot match leave its results as they are
+    def _matches_query(self, item: ClipItem):
+        return bool(self._index.rank(self._shown_query, [item], 1))
+
+    def _on_history_inserted(self, pos: int, item: ClipItem):
+        mode = self._grid_mode()
+        if mode == "live":
+            self._model.insert_item(pos, item)
+            self._preload_cells(pos)
+            sel = self._selected_idx
+            if sel is not None and pos <= sel:
+                self._follow_selection(sel + 1)
+            self._refresh_empty()
+        # A filtered grid waits for _on_ingested; placeholders never rank
+
+    def _on_history_removed(self, pos: int, item: ClipItem):
+        mode = self._grid_mode()
+        if mode == "filtered":
+            try:
+                pos = self._visible.index(item)
+            except ValueError:
+                return
+        elif mode != "live":
+            return
+        self._model.remove_item(pos)
+        sel = self._selected_idx
+        if sel is not None:
+            if pos < sel:
+                self._follow_selection(sel - 1)
+            elif pos == sel:
+                if self._visible:
+                    self._selected_idx = min(sel, len(self._visible) - 1)
+                    self._select_card(self._selected_idx, scroll=False)
+                else:
+                    self._selected_idx = None
+                    self._hide_preview_panel()
+        self._refresh_empty()
+
+    def _on_history_moved(self, src: int, dst: int, item: ClipItem):
+        mode = self._grid_mode()
+        if mode == "live":
+            self._model.move_item(src, dst)
+            self._preload_cells(dst)
+            sel = self._selected_idx
+            if sel is not None:
+                if sel == src:
+                    sel = dst
+                elif dst <= sel < src:
+                    sel += 1
+                elif src < sel <= dst:
+                    sel -= 1
+                if sel != self._selected_idx:
+                    self._follow_selection(sel)
+        elif mode == "filtered" and self._matches_query(item):
+            self._search_timer.start()
+
+    def _on_history_appended(self, start: int, count: int):
+        mode = self._grid_mode()
+        if mode == "live":
+            self._model.append_items(self._history[start:start + count])
+            self._refresh_empty()
+
+    def _on_history_reset(self):
+        mode = self._grid_mode()
+        if mode is None:
+            return
+        self._hide_preview_panel()
+        if mode == "live":
+            self._rebuild()
+        else:
+            self._search_timer.start()
+
+    def _rebuild(self, query="", ranked=None):
+        W    = self._screen_geo.width() - 380
+        cols = max(2, (W - 80) // (CARD_W + CARD_GAP))
+        self._grid_cols = cols
+        self._model.set_columns(cols)
+
+        matches = None
+        if query and ranked is None:
+            # Synchronous path: anything still in flight is now stale
+            self._search_gen = self._searcher.cancel()
+            ranked = self._index.rank(query, self._history.snapshot())
+        if query:
+            items   = [item for item, _ in ranked]
+            matches = {item.id: positions for item, positions in ranked}
+        else:
+            self._search_gen = self._searcher.cancel()
+            items = self._history.snapshot()
+        self._shown_query = query
+        self._visible     = items
+        self._model.set_items(self._visible, matches)
+        shown = len(self._visible)
+
+        self._refresh_usage()
         self._section_lbl.setText(
-            f"{shown} RESULT{'S' if shown != 1 else ''} FOR \"{q.upper()}\"" if q else "RECENT"
+            (f"TOP {shown} RESULTS FOR \"{query.upper()}\"" if shown >= TOP_K else
+             f"{shown} RESULT{'S' if shown != 1 else ''} FOR \"{query.upper()}\"") if query else "RECENT"
         )
         self._refresh_empty()
         self._selected_idx = None
 
-    def _rebuild_and_select(self, query="", select_idx=0):
-        self._rebuild(query)
-        if self._visible_cards:
-            idx = min(select_idx, len(self._visible_cards) - 1)
+    def _rebuild_and_select(self, query="", select_idx=0, ranked=None):
+        self._rebuild(query, ranked)
+        if self._visible:
+            idx = min(select_idx, len(self._visible) - 1)
             self._selected_idx = idx
             self._select_card(idx)
 
-    def _filter(self, text):
-        self._rebuild_and_select(text, select_idx=0)
+    def _filter(self):
+        text = self._search.text()
+        if not text:
+            self._rebuild_and_select(select_idx=0)
+            return
+        self._search_gen = self._searcher.submit(text, self._history.snapshot())
+
+    def _on_search_results(self, gen: int, query: str, ranked: list):
+        if gen != self._search_gen or query != self._search.text():
+            return
+        if query == self._shown_query:
+            self._refresh_results(ranked)
+        else:
+            self._rebuild_and_select(query, select_idx=0, ranked=ranked)
+
+    # The shown query re-ran after history changed: the selected entry stays
+    # selected wherever it now ranks and the grid keeps its scroll position
+    def _refresh_results(self, ranked: list):
+        sel    = self._selected_idx
+        sel_id = self._visible[sel].id if sel is not None else None
+        scroll = self._grid.verticalScrollBar().value()
+        self._rebuild(self._shown_query, ranked)
+        if not self._visible:
+            self._hide_preview_panel()
+            return
+        if sel is not None:
+            pos = next((n for n, item in enumerate(self._visible) if item.id == sel_id),
+                       min(sel, len(self._visible) - 1))
+            self._selected_idx = pos
+            self._select_card(pos, scroll=False)
+        self._grid.verticalScrollBar().setValue(scroll)
 
     def _clear_all(self):
+        self._stop_loading()
+        self._evict_timer.stop()
         self._history.clear()
-        self._rebuild()
-        self._hide_preview_panel()
+        self._by_digest.clear()
+        self._similar.clear()
+        self._budget.clear()
+        self._index.clear()
+        self._pixmaps.clear()
+        self._writer.clear()
+        self._refresh_usage()
+
+    # Exports and imports stream through the store on their own thread;
+    # returns False while one is already running
+    def export_history(self, path: str):
+        return self._run_archive("export", path)
+
+    def import_history(self, path: str):
+        return self._run_archive("import", path)
+
+    def _run_archive(self, op: str, path: str):
+        if self._archive is not None and self._archive.isRunning():
+            return False
+        self._archive = ArchiveThread(self._store, op, path)
+        self._archive.progress.connect(lambda done, total: self.archive_progress.emit(op, done, total))
+        self._archive.completed.connect(lambda ok, message: self._on_archive_done(op, ok, message))
+        self._archive.start()
+        return True
+
+    def _on_archive_done(self, op: str, ok: bool, message: str):
+        if op == "import":
+            self._reload()
+        self.archive_done.emit(ok, message)
+
+    # Re-reads history from the store, e.g. after an import placed entries
+    # between existing ones. Queued writes land first; captures still in the
+    # ingest pipeline are not in the store yet and stay on top
+    def _reload(self):
+        self._stop_loading()
+        self._evict_timer.stop()
+        if not self._writer.flush():
+            print("[FullscreenOverlay] store writer did not flush before reload")
+        pending = [item for item in self._history if item.pending]
+        self._history.clear()
+        self._by_digest.clear()
+        self._similar.clear()
+        self._budget.clear()
+        self._index.clear()
+        first = self._register(self._store.page(FIRST_PAGE))
+        self._history.extend(pending + first)
+        self._load_rest([it.id for it in first])
+        self._refresh_usage()
+        if self._budget.victim(self._history) is not None:
+            self._evict_timer.start()
 
     def _delete_item(self, idx: int):
         if 0 <= idx < len(self._history):
-            keep = min(self._selected_idx or 0, len(self._history) - 2)
-            keep = max(keep, 0)
-            self._history.pop(idx)
-            self._rebuild_and_select(self._search.text(), select_idx=keep)
+            self._drop(idx)
+            self._refresh_usage()
 
     def _refresh_empty(self):
         has = len(self._history) > 0
         self._empty.setVisible(not has)
         self._grid_container.setVisible(has)
 
-    def _paste_item(self, item: dict):
-        self.fade_out()
-        if item["type"] == "text":
-            QTimer.singleShot(350, lambda: paste_text(item["text"]))
-        elif item["type"] == "image":
-            QTimer.singleShot(350, lambda: paste_image(item["image"]))
+    def set_instant_paste(self, instant: bool):
+        self._instant_paste = instant
 
-    def _plain_item(self, item: dict):
-        self.fade_out()
-        if item["type"] == "text":
-            QTimer.singleShot(350, lambda: paste_text(item["text"]))
+    def _paste_item(self, item: ClipItem):
+        spans.begin("paste")
+        item = self._store.resolve(item)
+        if item is None:
+            spans.cancel("paste")
+            self.fade_out()
+            return
+        spans.mark("paste", "resolve")
+        if item.type == "text":
+            self._paste_on_hide(paste_text, item.text)
+        elif item.type == "image":
+            self._paste_on_hide(paste_image, item.dib)
+
+    def _plain_item(self, item: ClipItem):
+        spans.begin("paste")
+        item = self._store.resolve(item)
+        if item is not None and item.type == "text":
+            spans.mark("paste", "resolve")
+            self._paste_on_hide(paste_text, item.text)
+        else:
+            spans.cancel("paste")
+            self.fade_out()
+
+    # Pastes into whichever window has focus without opening the overlay,
+    # e.g. for the IPC server; goes through the overlay when it is open
+    def paste_item(self, item: ClipItem):
+        if self.isVisible():
+            self._paste_item(item)
+            return
+        spans.begin("paste")
+        item = self._store.resolve(item)
+        if item is None:
+            spans.cancel("paste")
+            return
+        spans.mark("paste", "resolve")
+        hwnd = win32gui.GetForegroundWindow()
+        if item.type == "text":
+            paste_text(item.text, hwnd)
+        elif item.type == "image":
+            paste_image(item.dib, hwnd)
+
+    # The paste starts once the overlay is gone, after the fade or at once
+    # in instant mode; the rest waits on the target window (backend.PasteJob)
+    def _paste_on_hide(self, paste, payload):
+        hwnd = self._prev_hwnd
+        def start():
+            spans.mark("paste", "hide")
+            paste(payload, hwnd)
+        self.fade_out(then=start, instant=self._instant_paste)
 
     def _paste_selected(self):
-        if self._selected_idx is not None and self._visible_cards:
-            self._paste_item(self._visible_cards[self._selected_idx].item)
+        if self._selected_idx is not None and self._visible:
+            self._paste_item(self._visible[self._selected_idx])
         elif self._history:
             self._paste_item(self._history[0])
 
     def _plain_selected(self):
-        if self._selected_idx is not None and self._visible_cards:
-            item = self._visible_cards[self._selected_idx].item
-            if item["type"] == "text":
+        if self._selected_idx is not None and self._visible:
+            item = self._visible[self._selected_idx]
+            if item.type == "text":
                 self._plain_item(item)
-        elif self._history and self._history[0]["type"] == "text":
+        elif self._history and self._history[0].type == "text":
             self._plain_item(self._history[0])
 
     def _delete_selected(self):
-        if self._selected_idx is not None and self._visible_cards:
-            self._delete_item(self._visible_cards[self._selected_idx].index)
+        if self._selected_idx is not None and self._visible:
+            self._on_card_delete(self._visible[self._selected_idx])
         elif self._history:
             self._delete_item(0)
 
     def fade_in(self):
+        spans.mark("show", "dispatch")
+        if not self._ui_ready:
+            self.ensure_ui()
+            spans.mark("show", "ui")
         self._prev_hwnd = win32gui.GetForegroundWindow()
         self._capture_desktop()
+        spans.mark("show", "capture")
         self.setWindowOpacity(0)
         self.show()
         self.activateWindow()
         self.raise_()
-        self._search.clear()
-        self._preview_visible = False
-        self._preview_panel.setMaximumWidth(0)
-        self._preview_panel.clear()
-        self._rebuild_and_select(select_idx=0)
+        spans.mark("show", "map")
+        # The grid is already current; only a view left filtered (shown
+        # again mid fade-out) needs resetting
+        if self._shown_query or self._search.text():
+            self._reset_view()
+        if self._visible:
+            self._selected_idx = 0
+            self._select_card(0)
         self.setFocus()
+        spans.mark("show", "select")
+        spans.begin("fade")
         self._anim = QPropertyAnimation(self, b"windowOpacity")
         self._anim.setDuration(260)
         self._anim.setStartValue(0.0)
         self._anim.setEndValue(1.0)
         self._anim.setEasingCurve(QEasingCurve.Type.OutCubic)
+        self._anim.finished.connect(lambda: spans.end("fade"))
         self._anim.start()
 
-    def fade_out(self):
+    # then() runs once the overlay is hidden; not at all if it is shown
+    # again first
+    def fade_out(self, then=None, instant=False):
+        spans.cancel("show")
+        spans.cancel("fade")
         if self._prev_hwnd:
             try:
                 win32gui.SetForegroundWindow(self._prev_hwnd)
             except Exception:
                 pass
+        if instant or not self.isVisible():
+            if self._anim is not None:
+                self._anim.stop()
+            self._anim = None
+            self.hide()
+            if then is not None:
+                then()
+            return
         self._anim = QPropertyAnimation(self, b"windowOpacity")
         self._anim.setDuration(180)
         self._anim.setStartValue(self.windowOpacity())
         self._anim.setEndValue(0.0)
         self._anim.setEasingCurve(QEasingCurve.Type.InCubic)
         self._anim.finished.connect(self.hide)
+        if then is not None:
+            self._anim.finished.connect(then)
         self._anim.start()
 
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self._ui_ready:
+            self._reset_view()
+
+    # Back to the unfiltered grid at the top with nothing selected, done on
+    # hide so the next open starts from here at no cost
+    def _reset_view(self):
+        self._search_timer.stop()
+        self._search.blockSignals(True)
+        self._search.clear()
+        self._search.blockSignals(False)
+        self._preview_anim = None
+        self._preview_visible = False
+        self._preview_panel.setMaximumWidth(0)
+        self._preview_panel.clear()
+        if self._shown_query:
+            self._rebuild()
+        self._selected_idx = None
+        self._grid.clearSelection()
+        self._grid.setCurrentIndex(QModelIndex())
+        self._grid.scrollToTop()
+        self._prefetch_thumbs()
+
+    # Thumbnails for the first screenful are loaded while hidden so the
+    # first frame after opening does not wait on the store
+    def _prefetch_thumbs(self):
+        self._grid.card_delegate().prefetch(self._visible[:PREFETCH_CARDS])
+
+    def _preload_cells(self, pos: int):
+        if not self.isVisible() and pos < PREFETCH_CARDS:
+            self._grid.card_delegate().prefetch(self._visible[pos:pos + 1])
+
     def toggle_visibility(self):
         if self.isVisible() and self.windowOpacity() > 0.5:
             self.fade_out()
@@ -468,6 +997,22 @@ class FullscreenOverlay(QWidget):
     def _quit(self):
         QApplication.instance().quit()
 
+    def shutdown(self):
+        self._search_timer.stop()
+        self._evict_timer.stop()
+        # Let in-flight captures land so the writer persists them
+        self._ingest.shutdown()
+        QApplication.sendPostedEvents(None, QEvent.Type.MetaCall)
+        self._searcher.stop()
+        self._loader.stop()
+        self._loader.wait(400)
+        if self._archive is not None:
+            self._archive.stop()
+            self._archive.wait()
+        self._writer.stop()
+        self._writer.wait()
+        self._searcher.wait(400)
+
     def _apply_style(self):
         self.setStyleSheet("""
             QWidget {
@@ -490,33 +1035,19 @@ class FullscreenOverlay(QWidget):
             #clear_btn { background: transparent; border: 1px solid rgba(255,70,70,0.16); border-radius: 12px; color: rgba(255,85,85,0.45); font-size: 12px; font-weight: 600; padding: 0 20px; }
             #clear_btn:hover { background: rgba(255,70,70,0.09); border-color: rgba(255,70,70,0.35); color: rgba(255,105,105,0.80); }
             #section_lbl { font-size: 9.5px; font-weight: 800; color: rgba(34,211,195,0.20); background: transparent; letter-spacing: 2px; padding-left: 40px; }
-            #scroll_area { background: transparent; border: none; }
+            #clip_grid { background: transparent; border: none; }
             #grid_container { background: transparent; }
             QScrollBar:vertical { background: transparent; width: 4px; margin: 8px 2px; }
             QScrollBar::handle:vertical { background: rgba(34,211,195,0.15); border-radius: 2px; min-height: 24px; }
             QScrollBar::handle:vertical:hover { background: rgba(34,211,195,0.32); }
             QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0; }
-            #ClipCard { background: rgba(10, 15, 22, 0.80); border: 1px solid rgba(255,255,255,0.06); border-radius: 14px; }
-            #ClipCard:hover { background: rgba(14, 22, 33, 0.90); border: 1px solid rgba(34,211,195,0.22); }
-            #ClipCard[selected="true"] { background: rgba(22, 38, 50, 0.95); border: 1.5px solid rgba(34,211,195,0.55); }
-            #sel_bar { background: qlineargradient(x1:0,y1:0,x2:1,y2:0, stop:0 rgba(34,211,195,0), stop:0.3 #22d3c3, stop:0.7 #22d3c3, stop:1 rgba(34,211,195,0)); border-radius: 1px; }
-            #badge_txt { background: rgba(99,179,237,0.13); color: #63b3ed; border: 1px solid rgba(99,179,237,0.26); border-radius: 4px; font-size: 9px; font-weight: 800; padding: 1px 5px; letter-spacing: 0.8px; }
-            #badge_img { background: rgba(34,211,195,0.13); color: #22d3c3; border: 1px solid rgba(34,211,195,0.26); border-radius: 4px; font-size: 9px; font-weight: 800; padding: 1px 5px; letter-spacing: 0.8px; }
-            #card_ts { font-size: 10px; color: rgba(255,255,255,0.17); background: transparent; font-family: 'Consolas', monospace; }
-            #card_del { background: transparent; border: none; color: rgba(255,70,70,0.22); font-size: 11px; border-radius: 3px; }
-            #card_del:hover { background: rgba(255,70,70,0.10); color: rgba(255,100,100,0.75); }
-            #card_text_preview { font-size: 11.5px; color: rgba(175,205,225,0.58); background: transparent; }
-            #card_img_preview { background: transparent; }
-            #card_spacer { background: transparent; border: none; }
             #preview_panel_outer { background: rgba(6, 10, 16, 0.88); border-left: 1px solid rgba(34,211,195,0.10); }
             #preview_badge_txt { background: rgba(99,179,237,0.14); color: #63b3ed; border: 1px solid rgba(99,179,237,0.28); border-radius: 6px; font-size: 10px; font-weight: 800; padding: 2px 10px; letter-spacing: 1px; }
             #preview_badge_img { background: rgba(34,211,195,0.14); color: #22d3c3; border: 1px solid rgba(34,211,195,0.28); border-radius: 6px; font-size: 10px; font-weight: 800; padding: 2px 10px; letter-spacing: 1px; }
             #preview_badge { background: transparent; border: none; }
             #preview_ts { font-size: 11px; color: rgba(255,255,255,0.20); background: transparent; font-family: 'Consolas', monospace; }
-            #preview_text_scroll { background: transparent; border: none; }
-            #preview_text_inner { background: transparent; }
+            #preview_text { background: transparent; border: none; font-size: 13px; color: rgba(200,224,240,0.85); selection-background-color: rgba(34,211,195,0.25); }
             #preview_img_scroll { background: transparent; border: none; }
-            #preview_text_lbl { font-size: 13px; color: rgba(200,224,240,0.85); background: transparent; line-height: 1.7; }
             #preview_img_lbl { background: transparent; }
             #preview_meta { font-size: 11px; color: rgba(34,211,195,0.35); background: transparent; font-family: 'Consolas', monospace; }
             #preview_div { color: rgba(255,255,255,0.06); }
@@ -524,6 +1055,10 @@ class FullscreenOverlay(QWidget):
             #preview_paste_btn:hover { background: rgba(34,211,195,0.24); border-color: rgba(34,211,195,0.55); color: #50ffe8; }
             #preview_plain_btn { background: rgba(99,179,237,0.08); border: 1px solid rgba(99,179,237,0.18); border-radius: 11px; color: rgba(99,179,237,0.65); font-size: 12px; font-weight: 600; }
             #preview_plain_btn:hover { background: rgba(99,179,237,0.18); border-color: rgba(99,179,237,0.40); color: #90cdf4; }
+            #preview_versions { background: transparent; }
+            #preview_version_btn { background: rgba(255,255,255,0.03); border: 1px solid rgba(255,255,255,0.08); border-radius: 6px; padding: 0; }
+            #preview_version_btn:hover { border-color: rgba(34,211,195,0.35); }
+            #preview_version_btn:checked { background: rgba(34,211,195,0.10); border-color: rgba(34,211,195,0.70); }
             #preview_empty_hint { font-size: 14px; color: rgba(255,255,255,0.08); background: transparent; line-height: 1.8; }
             #empty_state { background: transparent; }
         """)
\ No newline at end of file
@@ -0,0 +1,105 @@
+from collections import defaultdict
+
+# Difference hash over a HASH_SIDE x HASH_SIDE grid of brightness steps,
+# so re-captures of the same window that differ by a few pixels (a cursor,
+# a clock) land a few bits apart while different content is far apart
+HASH_SIDE    = 16
+HASH_BITS    = HASH_SIDE * HASH_SIDE
+BAND_BITS    = 16
+BANDS        = HASH_BITS // BAND_BITS
+HASH_MASK    = (1 << HASH_BITS) - 1
+# Bits two hashes may differ by and still count as the same image; below
+# BANDS, so any such pair agrees on at least one whole band
+MAX_DISTANCE = 10
+# Flat images and plain gradients hash to (nearly) all zeros or all ones
+# whatever their colour; such hashes say nothing and are never matched
+MIN_BITS     = 16
+# Brightness steps ignore colour, so above the hash bits sits the mean RGB
+# of a COLOR_SIDE x COLOR_SIDE grid, topped by a marker bit. Matches must
+# agree per cell and channel within COLOR_TOLERANCE
+COLOR_SIDE      = 2
+COLOR_BITS      = COLOR_SIDE * COLOR_SIDE * 3 * 8
+COLOR_MARK      = 1 << (HASH_BITS + COLOR_BITS)
+COLOR_TOLERANCE = 24
+
+def dhash(img):
+    # Imported here; PIL is only loaded with the overlay
+    from PIL import Image
+    small = img.resize((HASH_SIDE + 1, HASH_SIDE), Image.Resampling.BOX)
+    px    = small.convert("L").tobytes()
+    h     = 0
+    for row in range(HASH_SIDE):
+        line = px[row * (HASH_SIDE + 1):(row + 1) * (HASH_SIDE + 1)]
+        for col in range(HASH_SIDE):
+            h = (h << 1) | (line[col] > line[col + 1])
+    color = small.convert("RGB").resize((COLOR_SIDE, COLOR_SIDE), Image.Resampling.BOX).tobytes()
+    return COLOR_MARK | (int.from_bytes(color, "big") << HASH_BITS) | h
+
+def distance(a: int, b: int):
+    return bin((a ^ b) & HASH_MASK).count("1")
+
+def informative(h: int):
+    return MIN_BITS <= bin(h & HASH_MASK).count("1") <= HASH_BITS - MIN_BITS
+
+# Hashes from before the colour grid was added carry no marker and never match
+def same_colors(a: int, b: int):
+    if not (a & b & COLOR_MARK):
+        return False
+    ca = (a >> HASH_BITS).to_bytes(COLOR_BITS // 8 + 1, "big")
+    cb = (b >> HASH_BITS).to_bytes(COLOR_BITS // 8 + 1, "big")
+    return all(abs(x - y) <= COLOR_TOLERANCE for x, y in zip(ca[1:], cb[1:]))
+
+# Images by perceptual hash, looked up by near-equality. Only images of the
+# same size are compared: a screenshot series keeps its dimensions
+class PhashIndex:
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self._max     = max_distance
+        self._items   = {}
+        self._buckets = defaultdict(set)
+
+    def __len__(self):
+        return len(self._items)
+
+    def _keys(self, item):
+        h = item.phash
+        return [(item.width, item.height, band, (h >> (band * BAND_BITS)) & 0xFFFF)
+                for band in range(BANDS)]
+
+    def add(self, item):
+        if item.phash is None or not informative(item.phash):
+            return
+        self._items[item.id] = item
+        for key in self._keys(item):
+            self._buckets[key].add(item.id)
+
+    def remove(self, item):
+        if self._items.pop(item.id, None) is None:
+            return
+        for key in self._keys(item):
+            ids = self._buckets.get(key)
+            if ids is not None:
+                ids.discard(item.id)
+                if not ids:
+                    del self._buckets[key]
+
+    def clear(self):
+        self._items.clear()
+        self._buckets.clear()
+
+    # The closest indexed image within max_distance of item and of the same
+    # colours, or None
+    def nearest(self, item):
+        if item.phash is None or not informative(item.phash):
+            return None
+        best, best_d = None, self._max + 1
+        seen = set()
+        for key in self._keys(item):
+            for other_id in self._buckets.get(key, ()):
+                if other_id in seen or other_id == item.id:
+                    continue
+                seen.add(other_id)
+                other = self._items[other_id]
+                d = distance(item.phash, other.phash)
+                if d < best_d and same_colors(item.phash, other.phash):
+                    best, best_d = other, d
+        return best
@@ -0,0 +1,391 @@
+import heapq
+import threading
+import zlib
+from collections import OrderedDict
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+CHECK_EVERY  = 512
+MAX_KEY      = 512 * 1024
+# Keys at least this long are kept zlib-compressed; the table stays plain
+PACK_MIN     = 4 * 1024
+# Characters of unpacked and fetched keys kept between queries
+UNPACKED_MAX = 8 * 1024 * 1024
+# Ranked searches return at most this many entries, best first
+TOP_K        = 500
+
+# fzf-style scoring: every matched character earns SCORE_MATCH, runs and
+# word starts earn bonuses, gaps between matched characters cost
+SCORE_MATCH       = 16
+BONUS_BOUNDARY    = 8
+BONUS_FIRST       = 2
+BONUS_CONSECUTIVE = 8
+GAP_START         = 5
+GAP_EXTENSION     = 1
+# Added for the newest entry and fading to nothing for the oldest
+RECENCY_BONUS     = 16
+
+# Words (whitespace-separated runs) of indexed keys feed a GramTable, which
+# bounds what a term can score. A key bringing more than NEW_WORDS_MAX
+# characters of unseen words, or any key once the vocabulary holds VOCAB_MAX
+# characters, stays out of the table and is always scored
+NEW_WORDS_MAX = 64 * 1024
+VOCAB_MAX     = 8 * 1024 * 1024
+# Same-word gaps are recorded up to this many characters
+GAP_SPAN      = 8
+
+# One bit per character class; an entry can only match a query whose bits
+# are all set in its table
+def char_mask(text: str):
+    mask = 0
+    for c in set(text):
+        mask |= 1 << (ord(c) & 63)
+    return mask
+
+# Score and positions of one search term in key, or None. An exact
+# substring wins; otherwise the tightest subsequence ending at the leftmost
+# possible end
+def fuzzy_match(term: str, key: str):
+    pos = key.find(term)
+    if pos >= 0:
+        # A run scores the same wherever it sits, bar the boundary bonus
+        score = len(term) * SCORE_MATCH + (len(term) - 1) * BONUS_CONSECUTIVE
+        if pos == 0 or not key[pos - 1].isalnum():
+            score += BONUS_BOUNDARY * BONUS_FIRST
+        return score, range(pos, pos + len(term))
+    find = key.find
+    pos  = -1
+    for c in term:
+        pos = find(c, pos + 1)
+        if pos < 0:
+            return None
+    positions     = [0] * len(term)
+    positions[-1] = pos
+    rfind = key.rfind
+    for j in range(len(term) - 2, -1, -1):
+        pos = rfind(term[j], 0, pos)
+        positions[j] = pos
+    return fuzzy_score(key, positions), positions
+
+def fuzzy_score(key: str, positions):
+    score = 0
+    prev  = -2
+    for n, p in enumerate(positions):
+        score += SCORE_MATCH
+        if p == prev + 1:
+            score += BONUS_CONSECUTIVE
+            prev = p
+            continue
+        if n:
+            score -= GAP_START + (p - prev - 2) * GAP_EXTENSION
+        if p == 0 or not key[p - 1].isalnum():
+            score += BONUS_BOUNDARY * (BONUS_FIRST if n == 0 else 1)
+        prev = p
+    return score
+
+# Collapses sorted match positions into (start, length) runs for highlighting
+def spans(positions):
+    out = []
+    for p in positions:
+        if out and out[-1][0] + out[-1][1] == p:
+            out[-1][1] += 1
+        else:
+            out.append([p, 1])
+    return [tuple(s) for s in out]
+
+# What the words of indexed keys contain: bigrams, word starts (" x") and
+# bigrams at one (" xy"), the shortest in-word gaps between two characters,
+# and how close each character comes to the start and end of a word. Gaps,
+# heads and tails are kept for any occurrence and for occurrences at a word
+# start. A term never contains whitespace, so a run of matched characters
+# stays within one word and a gap across words spans the rest of one word,
+# the whitespace and the head of the next
+class GramTable:
+    def __init__(self):
+        self.grams = set()
+        # (a, c, a at a word start, c at a word start) -> characters between
+        self.gaps  = {}
+        # (c, at a word start) -> characters before / after it in its word
+        self.head  = {}
+        self.tail  = {}
+
+    def add_word(self, word: str):
+        grams, gaps, head, tail = self.grams, self.gaps, self.head, self.tail
+        last  = len(word) - 1
+        start = [i == 0 or not word[i - 1].isalnum() for i in range(len(word))]
+        for i, c in enumerate(word):
+            pair = word[i:i + 2]
+            grams.add(pair)
+            for at in ((False, True) if start[i] else (False,)):
+                if at:
+                    grams.add(" " + c)
+                    grams.add(" " + pair)
+                if head.get((c, at), i + 1) > i:
+                    head[c, at] = i
+                if tail.get((c, at), last - i + 1) > last - i:
+                    tail[c, at] = last - i
+            for j in range(i + 2, min(i + GAP_SPAN + 1, last + 1)):
+                skip = j - i - 1
+                for key in ((c, word[j], False, False), (c, word[j], start[i], False),
+                            (c, word[j], False, start[j]), (c, word[j], start[i], start[j])):
+                    if gaps.get(key, GAP_SPAN) > skip:
+                        gaps[key] = skip
+
+    def update(self, other):
+        self.grams |= other.grams
+        for mine, theirs in ((self.gaps, other.gaps), (self.head, other.head), (self.tail, other.tail)):
+            for k, v in theirs.items():
+                if mine.get(k, v + 1) > v:
+                    mine[k] = v
+
+    def clear(self):
+        self.grams.clear()
+        self.gaps.clear()
+        self.head.clear()
+        self.tail.clear()
+
+    # Least fuzzy_score can charge for a gap from a to c
+    def _gap(self, a, c, a_start, c_start):
+        skip = min(self.gaps.get((a, c, a_start, c_start), GAP_SPAN),
+                   self.tail.get((a, a_start), 0) + 1 + self.head.get((c, c_start), 0))
+        return GAP_START + (skip - 1) * GAP_EXTENSION
+
+    # Highest score fuzzy_score can give term in keys made of words in the
+    # table, or None when no such key holds all its characters. Tracks the
+    # best score with the last matched character at a word start after a
+    # gap, anywhere after a gap, or extending a run
+    def bound(self, term: str):
+        if any((c, False) not in self.head for c in term):
+            return None
+        grams = self.grams
+        none  = float("-inf")
+        word  = BONUS_BOUNDARY * BONUS_FIRST if " " + term[0] in grams else none
+        other = 0
+        run   = none
+        for a, c in zip(term, term[1:]):
+            after  = max(other, run)
+            extend = after + BONUS_CONSECUTIVE if a + c in grams else none
+            if " " + a + c in grams:
+                extend = max(extend, word + BONUS_CONSECUTIVE)
+            if " " + c in grams:
+                start = max(word - self._gap(a, c, True, True),
+                            after - self._gap(a, c, False, True)) + BONUS_BOUNDARY
+            else:
+                start = none
+            other = max(word - self._gap(a, c, True, False), after - self._gap(a, c, False, False))
+            word, run = start, extend
+        return len(term) * SCORE_MATCH + max(word, other, run)
+
+
+class FuzzyIndex:
+    # With a fetch(doc_id) -> text callable, keys longer than max_key are not
+    # kept in memory and are re-read on demand when their table matches.
+    # Long keys are packed and only unpacked once their table matches, into
+    # an LRU cache so that refining a query does not unpack them again
+    def __init__(self, fetch=None, max_key=MAX_KEY, unpacked_max=UNPACKED_MAX):
+        # doc_id -> (key, char_mask(key)); key is a str, zlib bytes or None
+        self._docs      = {}
+        self._fetch     = fetch
+        self._max_key   = max_key
+        self._lock      = threading.Lock()
+        # doc_id -> unpacked or fetched key, oldest use first
+        self._cache     = OrderedDict()
+        self._cached    = 0
+        self._cache_max = unpacked_max
+        # Words seen since the last clear and their GramTable; both only
+        # grow, which keeps its bound valid as entries go. Entries whose
+        # words are not in the table are in _loose
+        self._words     = set()
+        self._grams     = GramTable()
+        self._vocab     = 0
+        self._loose     = set()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    # key is already lowercased (ClipItem.search_key), so the item and the
+    # index can share one string while it is short
+    def add(self, doc_id, key: str):
+        mask  = char_mask(key)
+        words = set(key.split())
+        with self._lock:
+            words -= self._words
+        size  = sum(map(len, words))
+        grams = GramTable()
+        if size <= NEW_WORDS_MAX:
+            for word in words:
+                grams.add_word(word)
+        if self._fetch is not None and len(key) > self._max_key:
+            key = None
+        elif len(key) >= PACK_MIN:
+            key = zlib.compress(key.encode("utf-8", "surrogatepass"), 1)
+        with self._lock:
+            if size > NEW_WORDS_MAX or self._vocab + size > VOCAB_MAX:
+                self._loose.add(doc_id)
+            else:
+                self._loose.discard(doc_id)
+                self._words |= words
+                self._grams.update(grams)
+                self._vocab += size
+            self._docs[doc_id] = (key, mask)
+            self._evict(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._docs.pop(doc_id, None)
+            self._loose.discard(doc_id)
+            self._evict(doc_id)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._cache.clear()
+            self._cached = 0
+            self._words.clear()
+            self._grams.clear()
+            self._vocab = 0
+            self._loose.clear()
+
+    def _evict(self, doc_id):
+        key = self._cache.pop(doc_id, None)
+        if key is not None:
+            self._cached -= len(key)
+
+    # Plain key for a packed (bytes) or dropped (None) entry
+    def _key(self, doc_id, key):
+        with self._lock:
+            plain = self._cache.get(doc_id)
+            if plain is not None:
+                self._cache.move_to_end(doc_id)
+                return plain
+        if key is None:
+            text = self._fetch(doc_id)
+            plain = text.lower() if text is not None else ""
+        else:
+            plain = zlib.decompress(key).decode("utf-8", "surrogatepass")
+        if len(plain) > self._cache_max:
+            return plain
+        with self._lock:
+            # Not cached if the entry went away while unpacking
+            if doc_id in self._docs and doc_id not in self._cache:
+                self._cache[doc_id] = plain
+                self._cached += len(plain)
+                while self._cached > self._cache_max:
+                    self._cached -= len(self._cache.popitem(last=False)[1])
+        return plain
+
+    # Best `limit` entries of history (newest first) for query as
+    # (item, positions) pairs, best first; None when cancelled() reports the
+    # query has gone stale. Whitespace separates terms that must all match,
+    # in any order. Entries not indexed yet are skipped
+    def rank(self, query: str, history: list, limit=TOP_K, cancelled=None):
+        terms = query.lower().split()
+        if not terms:
+            return [(item, ()) for item in history[:limit]]
+        qmask  = char_mask("".join(terms))
+        single = terms[0] if len(terms) == 1 else None
+        # Nothing can outscore an exact match of every term at a word start,
+        # and no entry whose words are in the gram table can beat its bound
+        best   = sum(len(t) * SCORE_MATCH + (len(t) - 1) * BONUS_CONSECUTIVE
+                     + BONUS_BOUNDARY * BONUS_FIRST for t in terms)
+        with self._lock:
+            bounds = [self._grams.bound(t) for t in terms]
+            loose  = set(self._loose)
+        bound  = None if None in bounds else sum(bounds)
+        heap   = []
+        floor  = None
+        total  = len(history) or 1
+        get    = self._docs.get
+        for n, item in enumerate(history):
+            if cancelled and n % CHECK_EVERY == 0 and cancelled():
+                return None
+            recency = RECENCY_BONUS * (total - n) // total
+            # Recency only falls from here on, so once the weakest kept
+            # entry beats the best possible score the rest cannot place
+            if bound is None or floor is not None and floor >= bound + recency:
+                if not loose or floor is not None and floor >= best + recency:
+                    break
+                if item.id not in loose:
+                    continue
+            doc = get(item.id)
+            if doc is None or doc[1] & qmask != qmask:
+                continue
+            key = doc[0]
+            if type(key) is not str:
+                key = self._key(item.id, key)
+            if single is not None:
+                match = fuzzy_match(single, key)
+                if match is None:
+                    continue
+                score, positions = match
+            else:
+                score, positions = 0, set()
+                for term in terms:
+                    match = fuzzy_match(term, key)
+                    if match is None:
+                        break
+                    score += match[0]
+                    positions.update(match[1])
+                if match is None:
+                    continue
+                positions = sorted(positions)
+            score += recency
+            # History runs newest first, so on a tie the entry already kept wins
+            if floor is None:
+                heapq.heappush(heap, (score, -n, positions, item))
+                if len(heap) == limit:
+                    floor = heap[0][0]
+            elif score > floor:
+                heapq.heapreplace(heap, (score, -n, positions, item))
+                floor = heap[0][0]
+        heap.sort(key=lambda e: e[:2], reverse=True)
+        return [(item, positions) for _, _, positions, item in heap]
+
+
+class SearchThread(QThread):
+    # (generation, query, [(item, positions), ...])
+    results = pyqtSignal(int, str, object)
+
+    def __init__(self, index: FuzzyIndex):
+        super().__init__()
+        self._index   = index
+        self._cond    = threading.Condition()
+        self._pending = None
+        self._gen     = 0
+        self._running = True
+
+    def submit(self, query: str, history: list):
+        with self._cond:
+            self._gen    += 1
+            self._pending = (self._gen, query, history)
+            self._cond.notify()
+            return self._gen
+
+    def cancel(self):
+        with self._cond:
+            self._gen    += 1
+            self._pending = None
+            return self._gen
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                gen, query, history = self._pending
+                self._pending = None
+
+            stale  = lambda: self._gen != gen
+            ranked = self._index.rank(query, history, cancelled=stale)
+            if ranked is not None and not stale():
+                self.results.emit(gen, query, ranked)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
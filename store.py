@@ -0,0 +1,512 @@
+import hashlib
+import io
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+
+from PIL import Image
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from blobs import BlobStore, BLOB_THRESHOLD
+from clipitem import ClipItem
+import dib as dibfmt
+
+FIRST_PAGE  = 200
+PAGE_SIZE   = 2000
+MAX_HISTORY = 250_000
+BATCH_MS    = 50
+BATCH_MAX   = 256
+THUMB_SIZE  = (216, 60)
+# Stored image payloads are zlib-compressed DIBs behind this tag; older rows hold PNG
+DIB_MAGIC   = b"DIBZ"
+# Longest side an image is kept at once a newer near-identical capture
+# replaces it at the top of its version stack
+VERSION_SIZE = (640, 640)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id     INTEGER PRIMARY KEY,
+    ts     REAL    NOT NULL,
+    type   TEXT    NOT NULL,
+    label  TEXT    NOT NULL,
+    text   TEXT,
+    image  BLOB,
+    thumb  BLOB,
+    width  INTEGER,
+    height INTEGER,
+    blob   TEXT,
+    mode   TEXT,
+    digest TEXT,
+    size   INTEGER
+);
+CREATE INDEX IF NOT EXISTS clips_recent ON clips (ts DESC, id DESC);
+"""
+BLOB_INDEX   = "CREATE INDEX IF NOT EXISTS clips_blob ON clips (blob) WHERE blob IS NOT NULL"
+DIGEST_INDEX = "CREATE INDEX IF NOT EXISTS clips_digest ON clips (digest) WHERE digest IS NOT NULL"
+STACK_INDEX  = "CREATE INDEX IF NOT EXISTS clips_stack ON clips (stack) WHERE stack IS NOT NULL"
+
+# stack is the id of the newer capture an earlier version was folded into,
+# so a stack is a chain ending at the entry history shows (stack IS NULL)
+MIGRATIONS = (("blob", "TEXT"), ("mode", "TEXT"), ("digest", "TEXT"), ("size", "INTEGER"),
+              ("phash", "TEXT"), ("stack", "INTEGER"), ("versions", "INTEGER"))
+
+META_COLS = "id, ts, type, label, width, height, mode, digest, size, phash, versions"
+ROW_COLS  = "id, ts, type, label, text, image, thumb, width, height, blob, mode, digest, size"
+PUT_COLS  = ROW_COLS + ", phash, versions"
+
+def default_path():
+    base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "ClipVault", "history.db")
+
+def _meta(row):
+    item_id, ts, kind, label, width, height, mode, digest, size, phash, versions = row
+    item = ClipItem(kind, ts, None, None, label, item_id, width, height, mode, digest, size or 0)
+    item.phash    = int(phash, 16) if phash else None
+    item.versions = versions or 0
+    return item
+
+# Text is hashed as UTF-8; callers holding the encoded bytes (the archive
+# streams them from blobs) pass those instead
+def text_digest(text):
+    if isinstance(text, str):
+        text = text.encode("utf-8", "surrogatepass")
+    return hashlib.blake2b(text, digest_size=16, person=b"text").hexdigest()
+
+# Content fingerprint used to collapse repeat copies into one entry
+def fingerprint(item: ClipItem):
+    if item.type != "image":
+        return text_digest(item.text)
+    return hashlib.blake2b(item.dib, digest_size=16, person=b"image").hexdigest()
+
+# Bytes an entry accounts for against the history budget: decoded pixels
+# for images, UTF-8 length for text
+def _pixel_bytes(width, height, mode):
+    return (width or 0) * (height or 0) * Image.getmodebands(mode or "RGB")
+
+def item_size(item: ClipItem):
+    if item.type == "image":
+        return _pixel_bytes(item.width, item.height, item.mode)
+    text = item.text
+    return len(text) if text.isascii() else len(text.encode("utf-8", "surrogatepass"))
+
+def _png(img: Image.Image):
+    out = io.BytesIO()
+    img.save(out, "PNG", compress_level=1)
+    return out.getvalue()
+
+def _dib(data):
+    if data[:len(DIB_MAGIC)] == DIB_MAGIC:
+        return zlib.decompress(data[len(DIB_MAGIC):])
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return dibfmt.from_image(img)
+
+# SQLite text must be valid UTF-8. Text with lone surrogates (malformed
+# clipboard data) is kept byte-exact in a blob; its label loses them
+def _storable(text: str):
+    try:
+        text.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+def _encode(item: ClipItem, blobs: BlobStore):
+    text = image = thumb = width = height = blob = mode = None
+    label = item.label
+    if item.type == "image":
+        image  = DIB_MAGIC + zlib.compress(item.dib, 1)
+        small  = item.image.copy()
+        small.thumbnail(THUMB_SIZE)
+        thumb  = _png(small)
+        width, height, mode = item.width, item.height, item.mode
+        if len(image) > BLOB_THRESHOLD:
+            blob, image = blobs.put(image), None
+    else:
+        text = item.text
+        if not _storable(text):
+            blob, text = blobs.put(text.encode("utf-8", "surrogatepass")), None
+            label = label.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+        elif len(text) * 4 > BLOB_THRESHOLD:
+            data = text.encode("utf-8")
+            if len(data) > BLOB_THRESHOLD:
+                blob, text = blobs.put(data), None
+    phash = format(item.phash, "x") if item.phash is not None else None
+    return (item.id, item.ts, item.type, label,
+            text, image, thumb, width, height, blob, mode, item.digest, item.size,
+            phash, item.versions)
+
+# The version row for an image a newer capture was folded into: the pixels
+# scaled down to VERSION_SIZE and its thumbnail kept
+def _encode_version(dib: bytes):
+    img = dibfmt.decode(dib)
+    img.thumbnail(VERSION_SIZE)
+    small = dibfmt.from_image(img)
+    return (DIB_MAGIC + zlib.compress(small, 1), img.width, img.height,
+            _pixel_bytes(img.width, img.height, img.mode))
+
+class HistoryStore:
+    def __init__(self, path=None):
+        self._path  = path or default_path()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        self._blobs = BlobStore(os.path.join(os.path.dirname(os.path.abspath(self._path)), "blobs"))
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(clips)")}
+        for col, decl in MIGRATIONS:
+            if col not in cols:
+                conn.execute(f"ALTER TABLE clips ADD COLUMN {col} {decl}")
+        if "digest" not in cols:
+            self._backfill_digests(conn)
+        if "size" not in cols:
+            self._backfill_sizes(conn)
+        conn.execute(BLOB_INDEX)
+        conn.execute(DIGEST_INDEX)
+        conn.execute(STACK_INDEX)
+        last = conn.execute("SELECT MAX(id) FROM clips").fetchone()[0]
+        self._next_id = (last or 0) + 1
+        self._id_lock = threading.Lock()
+
+    # Inline text rows get fingerprints once on upgrade; older images and
+    # blob texts simply never match a new copy
+    def _backfill_digests(self, conn):
+        rows = conn.execute("SELECT id, text FROM clips WHERE type = 'text' AND text IS NOT NULL")
+        with conn:
+            conn.executemany("UPDATE clips SET digest = ? WHERE id = ?",
+                             [(text_digest(text), item_id)
+                              for item_id, text in rows])
+
+    def _backfill_sizes(self, conn):
+        rows = conn.execute(
+            "SELECT id, type, length(CAST(text AS BLOB)), blob, width, height, mode FROM clips").fetchall()
+        sizes = []
+        for item_id, kind, text_len, blob, width, height, mode in rows:
+            if kind == "image":
+                size = _pixel_bytes(width, height, mode)
+            elif text_len is None and blob:
+                size = self._blobs.size(blob)
+            else:
+                size = text_len or 0
+            sizes.append((size, item_id))
+        with conn:
+            conn.executemany("UPDATE clips SET size = ? WHERE id = ?", sizes)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def next_id(self):
+        with self._id_lock:
+            item_id = self._next_id
+            self._next_id += 1
+            return item_id
+
+    # Entries history shows; earlier versions in stacks are not counted
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM clips WHERE stack IS NULL").fetchone()[0]
+
+    def page(self, limit=FIRST_PAGE):
+        rows = self._conn().execute(
+            f"SELECT {META_COLS} FROM clips WHERE stack IS NULL "
+            "ORDER BY ts DESC, id DESC LIMIT ?", (limit,))
+        return [_meta(r) for r in rows]
+
+    def pages(self, size=PAGE_SIZE):
+        conn   = self._conn()
+        cursor = None
+        while True:
+            if cursor is None:
+                rows = conn.execute(
+                    f"SELECT {META_COLS} FROM clips WHERE stack IS NULL "
+                    "ORDER BY ts DESC, id DESC LIMIT ?", (size,)).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {META_COLS} FROM clips WHERE (ts, id) < (?, ?) AND stack IS NULL "
+                    "ORDER BY ts DESC, id DESC LIMIT ?", (*cursor, size)).fetchall()
+            if not rows:
+                return
+            cursor = (rows[-1][1], rows[-1][0])
+            yield [_meta(r) for r in rows]
+
+    # Search keys in ascending id order, so the index only ever appends
+    def search_keys(self, size=PAGE_SIZE):
+        conn = self._conn()
+        last = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, type, label, text, blob, stack FROM clips WHERE id > ? "
+                "ORDER BY id LIMIT ?", (last, size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            keys = []
+            for item_id, kind, label, text, blob, stack in rows:
+                if stack is not None:
+                    continue
+                if kind != "text":
+                    text = label
+                elif text is None and blob:
+                    text = self._blobs.read_text(blob) or ""
+                keys.append((item_id, text.lower()))
+            yield keys
+
+    @property
+    def blobs(self):
+        return self._blobs
+
+    # Full rows (ROW_COLS) of the entries history shows, in ascending id
+    # order; small pages, since inline payloads come along
+    def rows(self, size=64):
+        conn = self._conn()
+        last = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT {ROW_COLS} FROM clips WHERE id > ? AND stack IS NULL "
+                "ORDER BY id LIMIT ?", (last, size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+
+    # Earlier versions stacked under item_id, newest first
+    def versions(self, item_id):
+        rows = self._conn().execute(
+            "WITH RECURSIVE chain(id, depth) AS ("
+            " SELECT id, 1 FROM clips WHERE stack = ?"
+            " UNION ALL SELECT c.id, chain.depth + 1 FROM clips c JOIN chain ON c.stack = chain.id) "
+            f"SELECT {META_COLS} FROM clips JOIN chain USING (id) ORDER BY depth", (item_id,))
+        return [_meta(r) for r in rows]
+
+    def _stack_ids(self, conn, item_id):
+        return [r[0] for r in conn.execute(
+            "WITH RECURSIVE chain(id) AS ("
+            " SELECT ? UNION ALL SELECT c.id FROM clips c JOIN chain ON c.stack = chain.id) "
+            "SELECT id FROM chain", (item_id,))]
+
+    def has_digest(self, digest: str):
+        return self._conn().execute(
+            "SELECT 1 FROM clips WHERE digest = ? LIMIT 1", (digest,)).fetchone() is not None
+
+    def insert_rows(self, rows: list):
+        conn = self._conn()
+        with conn:
+            conn.executemany(f"INSERT INTO clips ({ROW_COLS}) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def load_text(self, item_id):
+        row = self._conn().execute("SELECT text, blob FROM clips WHERE id = ?", (item_id,)).fetchone()
+        if not row:
+            return None
+        text, blob = row
+        if text is None and blob:
+            text = self._blobs.read_text(blob)
+        return text
+
+    def load_dib(self, item_id):
+        row = self._conn().execute("SELECT image, blob FROM clips WHERE id = ?", (item_id,)).fetchone()
+        if not row:
+            return None
+        data, blob = row
+        if data is not None:
+            return _dib(data)
+        mm = self._blobs.open(blob) if blob else None
+        if mm is None:
+            return None
+        with mm:
+            return _dib(mm)
+
+    def load_thumb(self, item_id):
+        row = self._conn().execute("SELECT thumb FROM clips WHERE id = ?", (item_id,)).fetchone()
+        return row[0] if row else None
+
+    # The item itself when its payload is resident, else a loaded copy
+    def resolve(self, item: ClipItem):
+        if item.resident:
+            return item
+        if item.type == "image":
+            dib = self.load_dib(item.id)
+            return None if dib is None else item.copy(dib=dib)
+        text = self.load_text(item.id)
+        return None if text is None else item.copy(text=text)
+
+    # Each op is encoded and applied on its own, inside one transaction; one
+    # that fails is reported and skipped without losing the rest of the batch
+    def apply(self, ops):
+        conn     = self._conn()
+        released = set()
+        written  = []
+        with conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            for op, arg in ops:
+                try:
+                    prepared = self._prepare(op, arg)
+                    conn.execute("SAVEPOINT op")
+                    try:
+                        freed = self._apply(conn, op, prepared)
+                    except Exception:
+                        conn.execute("ROLLBACK TO op")
+                        raise
+                    finally:
+                        conn.execute("RELEASE op")
+                except Exception as e:
+                    print(f"[HistoryStore] {op} {arg!r} failed: {e}")
+                    continue
+                released.update(freed)
+                if op == "put":
+                    written.append(arg)
+
+        # Blobs are shared between identical payloads; drop only unreferenced ones
+        for digest in released:
+            if conn.execute("SELECT 1 FROM clips WHERE blob = ? LIMIT 1", (digest,)).fetchone() is None:
+                self._blobs.remove(digest)
+        return written
+
+    # Runs one prepared op; returns the blobs it may have left unreferenced
+    def _apply(self, conn, op, arg):
+        released = set()
+        if op == "put":
+            conn.execute(
+                f"INSERT OR REPLACE INTO clips ({PUT_COLS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", arg)
+        elif op == "touch":
+            conn.execute("UPDATE clips SET ts = ? WHERE id = ?", arg)
+        elif op == "fold":
+            item_id, stack, version = arg
+            released.update(r[0] for r in conn.execute(
+                "SELECT blob FROM clips WHERE id = ? AND blob IS NOT NULL", (item_id,)))
+            if version is None:
+                conn.execute("UPDATE clips SET stack = ? WHERE id = ?", (stack, item_id))
+            else:
+                conn.execute(
+                    "UPDATE clips SET stack = ?, image = ?, blob = NULL, width = ?, height = ?, "
+                    "size = ? WHERE id = ?", (stack, *version, item_id))
+        elif op == "delete":
+            # An entry goes with the versions stacked under it
+            for item_id in self._stack_ids(conn, arg):
+                released.update(r[0] for r in conn.execute(
+                    "SELECT blob FROM clips WHERE id = ? AND blob IS NOT NULL", (item_id,)))
+                conn.execute("DELETE FROM clips WHERE id = ?", (item_id,))
+        elif op == "clear":
+            released.update(r[0] for r in conn.execute(
+                "SELECT DISTINCT blob FROM clips WHERE blob IS NOT NULL"))
+            conn.execute("DELETE FROM clips")
+        return released
+
+    # Encodes outside the transaction: new rows, and the scaled-down copy a
+    # folded image keeps (its DIB is still on the item if not yet written)
+    def _prepare(self, op, arg):
+        if op == "put":
+            return _encode(arg, self._blobs)
+        if op == "fold":
+            item, stack = arg
+            dib = item.dib if item.dib is not None else self.load_dib(item.id)
+            return item.id, stack, _encode_version(dib) if dib is not None else None
+        return arg
+
+
+class StoreWriter(QThread):
+    committed = pyqtSignal(object)
+
+    def __init__(self, store: HistoryStore):
+        super().__init__()
+        self._store   = store
+        self._queue   = queue.Queue()
+        self._running = True
+
+    def put(self, item: ClipItem):
+        self._queue.put(("put", item))
+
+    def delete(self, item_id: int):
+        self._queue.put(("delete", item_id))
+
+    def touch(self, item_id: int, ts: float):
+        self._queue.put(("touch", (ts, item_id)))
+
+    # Stacks item under the newer capture stack_id and scales it down
+    def fold(self, item: ClipItem, stack_id: int):
+        self._queue.put(("fold", (item, stack_id)))
+
+    def clear(self):
+        self._queue.put(("clear", None))
+
+    # Blocks until everything queued before it is written; False on timeout
+    def flush(self, timeout=2.0):
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def run(self):
+        while self._running or not self._queue.empty():
+            try:
+                ops = [self._queue.get(timeout=0.2)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + BATCH_MS / 1000
+            while len(ops) < BATCH_MAX:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=left))
+                except queue.Empty:
+                    break
+            flushes = [arg for op, arg in ops if op == "flush"]
+            ops     = [(op, arg) for op, arg in ops if op != "flush"]
+            try:
+                written = self._store.apply(ops)
+            except Exception as e:
+                print(f"[StoreWriter] batch of {len(ops)} failed: {e}")
+                written = None
+            for done in flushes:
+                done.set()
+            if written:
+                self.committed.emit(written)
+        self._store.release()
+
+    def stop(self):
+        self._running = False
+
+
+class HistoryLoader(QThread):
+    page_loaded = pyqtSignal(object)
+
+    def __init__(self, store: HistoryStore, index, skip_ids=()):
+        super().__init__()
+        self._store    = store
+        self._index    = index
+        self._skip     = set(skip_ids)
+        self._running  = True
+
+    def run(self):
+        try:
+            for rows in self._store.pages():
+                if not self._running:
+                    return
+                items = [it for it in rows if it.id not in self._skip]
+                if items:
+                    self.page_loaded.emit(items)
+            for keys in self._store.search_keys():
+                if not self._running:
+                    return
+                for item_id, text in keys:
+                    self._index.add(item_id, text)
+        finally:
+            self._store.release()
+
+    def stop(self):
+        self._running = False
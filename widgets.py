@@ -1,21 +1,204 @@
-from PIL import ImageQt
+from collections import OrderedDict, defaultdict
+
+from PIL import Image, ImageOps, ImageQt
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QPushButton, QScrollArea, QFrame, QStackedWidget
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPlainTextEdit, QTextEdit,
+    QPushButton, QScrollArea, QFrame, QStackedWidget, QButtonGroup,
+    QTableView, QHeaderView, QAbstractItemView, QStyledItemDelegate, QStyle
+)
+from PyQt6.QtGui import (
+    QPixmap, QPainter, QColor, QPen, QFont, QLinearGradient, QPalette, QTextCursor, QIcon,
+    QTextLayout, QTextCharFormat, QTextOption
 )
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import (
+    Qt, pyqtSignal, QAbstractTableModel, QModelIndex, QPointF, QRect, QRectF, QSize, QEvent,
+    QThreadPool
+)
+
+from clipitem import ClipItem
+from search import spans
+
+CARD_W, CARD_H = 240, 130
+CARD_GAP       = 14
+THUMB_SIZE     = (CARD_W - 24, 60)
+PREVIEW_SIZE   = (340, 280)
+VERSION_THUMB  = (56, 36)
+# Versions of a stacked image offered in the preview, newest first
+VERSION_STRIP  = 6
+
+PIXMAP_CACHE_BYTES = 64 * 1024 * 1024
+PREVIEW_PAGE_CHARS = 32 * 1024
+C_MATCH    = QColor(34, 211, 195)
+C_MATCH_BG = QColor(34, 211, 195, 46)
+
+def scaled_pixmap(img, w: int, h: int):
+    pix = img if isinstance(img, QPixmap) else QPixmap.fromImage(ImageQt.ImageQt(img.convert("RGBA")))
+    if pix.isNull():
+        return pix
+    return pix.scaled(w, h,
+                      Qt.AspectRatioMode.KeepAspectRatio,
+                      Qt.TransformationMode.SmoothTransformation)
+
+# QImage counterpart of scaled_pixmap, safe to call off the GUI thread
+def scaled_image(img: Image.Image, w: int, h: int):
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA")
+    small = ImageOps.contain(img, (w, h), Image.Resampling.LANCZOS)
+    return ImageQt.ImageQt(small.convert("RGBA")).copy()
+
+class PixmapCache:
+    def __init__(self, max_bytes=PIXMAP_CACHE_BYTES):
+        self._max     = max_bytes
+        self._bytes   = 0
+        self._entries = OrderedDict()
+        self._by_item = defaultdict(set)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def usage(self):
+        return self._bytes
+
+    def get(self, item_id, size):
+        key = (item_id, *size)
+        pix = self._entries.get(key)
+        if pix is not None:
+            self._entries.move_to_end(key)
+        return pix
+
+    def put(self, item_id, size, pix: QPixmap):
+        key = (item_id, *size)
+        self._drop(key)
+        self._entries[key] = pix
+        self._by_item[item_id].add(key)
+        self._bytes += pix.width() * pix.height() * pix.depth() // 8
+        while self._bytes > self._max and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+        return pix
+
+    def discard(self, item_id):
+        for key in list(self._by_item.get(item_id, ())):
+            self._drop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_item.clear()
+        self._bytes = 0
+
+    def _drop(self, key):
+        pix = self._entries.pop(key, None)
+        if pix is None:
+            return
+        self._bytes -= pix.width() * pix.height() * pix.depth() // 8
+        keys = self._by_item[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_item[key[0]]
+
+# Qt text positions count UTF-16 units where Python counts code points, so
+# (start, length) spans shift past any character outside the BMP
+def qt_spans(text: str, positions):
+    out = spans(positions)
+    if text.isascii():
+        return out
+    units = lambda s: len(s.encode("utf-16-le")) // 2
+    return [(units(text[:start]), units(text[start:start + length])) for start, length in out]
+
+# Read-only text view that lays out one page at a time and appends the
+# next as the scrollbar nears the bottom
+class TextPager(QPlainTextEdit):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text  = ""
+        self._pos   = 0
+        self._spans = []
+        self.setReadOnly(True)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.WidgetWidth)
+        self.setUndoRedoEnabled(False)
+        self.verticalScrollBar().valueChanged.connect(self._maybe_more)
+
+    # positions are search matches to highlight, as character offsets
+    def set_text(self, text: str, positions=()):
+        self._text  = text
+        self._pos   = 0
+        self._spans = qt_spans(text, positions)
+        self.clear()
+        self._append_page()
+        self.verticalScrollBar().setValue(0)
+        if self._spans:
+            self._highlight()
+            marks = self.extraSelections()
+            if marks:
+                cursor = marks[0].cursor
+                cursor.setPosition(cursor.selectionStart())
+                self.setTextCursor(cursor)
+                self.ensureCursorVisible()
+
+    def _append_page(self):
+        text = self._text
+        end  = min(len(text), self._pos + PREVIEW_PAGE_CHARS)
+        if end < len(text):
+            nl = text.rfind("\n", self._pos, end)
+            if nl > self._pos:
+                end = nl + 1
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text[self._pos:end])
+        self._pos = end
+        if self._spans:
+            self._highlight()
+
+    # Only spans on pages already laid out are marked; the rest follow as
+    # more pages load
+    def _highlight(self):
+        fmt = QTextCharFormat()
+        fmt.setForeground(C_MATCH)
+        fmt.setBackground(C_MATCH_BG)
+        loaded = self.document().characterCount()
+        marks  = []
+        for start, length in self._spans:
+            if start + length >= loaded:
+                break
+            sel = QTextEdit.ExtraSelection()
+            sel.cursor = QTextCursor(self.document())
+            sel.cursor.setPosition(start)
+            sel.cursor.setPosition(start + length, QTextCursor.MoveMode.KeepAnchor)
+            sel.format = fmt
+            marks.append(sel)
+        self.setExtraSelections(marks)
+
+    def _maybe_more(self, value: int):
+        bar = self.verticalScrollBar()
+        if self._pos < len(self._text) and value >= bar.maximum() - bar.pageStep():
+            self._append_page()
 
 class PreviewPanel(QWidget):
-    paste_requested = pyqtSignal(dict)
-    plain_requested = pyqtSignal(dict)
+    paste_requested = pyqtSignal(object)
+    plain_requested = pyqtSignal(object)
+    _stats_ready    = pyqtSignal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName("PreviewPanel")
-        self._item = None
+        self._item    = None
+        self._resolve = lambda item: item
+        self._versions = lambda item_id: []
+        self._pixmaps = PixmapCache()
+        self._counting = set()
+        self._stats_ready.connect(self._on_stats)
         self._build_ui()
 
+    def set_resolver(self, resolve):
+        self._resolve = resolve
+
+    def set_pixmap_cache(self, cache: PixmapCache):
+        self._pixmaps = cache
+
+    def set_version_loader(self, load):
+        self._versions = load
+
     def _build_ui(self):
         lay = QVBoxLayout(self)
         lay.setContentsMargins(24, 28, 24, 24)
@@ -43,24 +226,9 @@ class PreviewPanel(QWidget):
         self._preview_stack.setObjectName("preview_stack")
 
         # Text page
-        self._text_scroll = QScrollArea()
-        self._text_scroll.setObjectName("preview_text_scroll")
-        self._text_scroll.setWidgetResizable(True)
-        self._text_scroll.setFrameShape(QFrame.Shape.NoFrame)
-        self._text_scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        text_inner = QWidget()
-        text_inner.setObjectName("preview_text_inner")
-        ti_lay = QVBoxLayout(text_inner)
-        ti_lay.setContentsMargins(0, 0, 0, 0)
-        self._text_lbl = QLabel()
-        self._text_lbl.setObjectName("preview_text_lbl")
-        self._text_lbl.setWordWrap(True)
-        self._text_lbl.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        self._text_lbl.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        ti_lay.addWidget(self._text_lbl)
-        ti_lay.addStretch()
-        self._text_scroll.setWidget(text_inner)
-        self._preview_stack.addWidget(self._text_scroll)  # index 0
+        self._text_view = TextPager()
+        self._text_view.setObjectName("preview_text")
+        self._preview_stack.addWidget(self._text_view)    # index 0
 
         # Image page
         self._img_scroll = QScrollArea()
@@ -87,6 +255,18 @@ class PreviewPanel(QWidget):
         self._preview_stack.setCurrentIndex(2)
         lay.addWidget(self._preview_stack, stretch=1)
 
+        # Version strip of a stacked image: the entry itself, then earlier captures
+        self._version_row = QWidget()
+        self._version_row.setObjectName("preview_versions")
+        vl = QHBoxLayout(self._version_row)
+        vl.setContentsMargins(0, 12, 0, 0)
+        vl.setSpacing(6)
+        vl.addStretch()
+        self._version_btns = QButtonGroup(self)
+        self._version_btns.setExclusive(True)
+        self._version_row.setVisible(False)
+        lay.addWidget(self._version_row)
+
         lay.addSpacing(20)
 
         # Meta info row
@@ -122,10 +302,16 @@ class PreviewPanel(QWidget):
         self._plain_btn.clicked.connect(self._on_plain)
         lay.addWidget(self._plain_btn)
 
-    def load(self, item: dict):
+    def load(self, item: ClipItem, positions=()):
+        full = item
+        if item.type == "text":
+            full = self._resolve(item)
+            if full is None:
+                self.clear()
+                return
         self._item = item
 
-        if item["type"] == "image":
+        if item.type == "image":
             self._type_badge.setText("  IMAGE  ")
             self._type_badge.setObjectName("preview_badge_img")
         else:
@@ -134,41 +320,116 @@ class PreviewPanel(QWidget):
         self._type_badge.style().unpolish(self._type_badge)
         self._type_badge.style().polish(self._type_badge)
 
-        self._ts_lbl.setText(item["ts"].strftime("Copied at %H:%M:%S  ·  %B %d"))
+        self._ts_lbl.setText(item.copied_at.strftime("Copied at %H:%M:%S  ·  %B %d"))
 
-        if item["type"] == "text":
-            self._text_lbl.setText(item["text"])
+        if item.type == "text":
+            self._text_view.set_text(full.text, positions)
             self._preview_stack.setCurrentIndex(0)
-            char_count = len(item["text"])
-            word_count = len(item["text"].split())
-            line_count = item["text"].count("\n") + 1
-            self._meta_lbl.setText(
-                f"{char_count:,} characters  ·  {word_count:,} words  ·  {line_count:,} line{'s' if line_count != 1 else ''}"
-            )
+            if item.stats is not None:
+                self._show_stats(item.stats)
+            else:
+                self._meta_lbl.setText(f"{len(full.text):,} characters  ·  counting…")
+                self._count(item, full.text)
             self._plain_btn.setVisible(True)
         else:
-            img = item["image"]
-            qt_img = ImageQt.ImageQt(img.convert("RGBA"))
-            pix = QPixmap.fromImage(qt_img).scaled(
-                340, 280,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            self._img_lbl.setPixmap(pix)
-            self._preview_stack.setCurrentIndex(1)
-            self._meta_lbl.setText(
-                f"{img.width} × {img.height} px  ·  {img.mode}"
-            )
+            if not self._show_image(item):
+                self.clear()
+                return
             self._plain_btn.setVisible(False)
 
+        self._fill_versions(item)
         self._paste_btn.setText("⏎  Paste this item")
 
+    def _show_image(self, item: ClipItem, note=""):
+        pix = self._pixmaps.get(item.id, PREVIEW_SIZE)
+        if pix is None:
+            full = self._resolve(item)
+            if full is None:
+                return False
+            pix = self._pixmaps.put(item.id, PREVIEW_SIZE, scaled_pixmap(full.image, *PREVIEW_SIZE))
+        self._img_lbl.setPixmap(pix)
+        self._preview_stack.setCurrentIndex(1)
+        if item.versions and not note:
+            note = f"{item.versions + 1} versions"
+        self._meta_lbl.setText(
+            f"{item.width} × {item.height} px" + (f"  ·  {item.mode}" if item.mode else "")
+            + (f"  ·  {note}" if note else "")
+        )
+        return True
+
+    def _clear_versions(self):
+        for btn in self._version_btns.buttons():
+            self._version_btns.removeButton(btn)
+            btn.deleteLater()
+        self._version_row.setVisible(False)
+
+    def _fill_versions(self, item: ClipItem):
+        self._clear_versions()
+        if item.type != "image" or not item.versions:
+            return
+        lay = self._version_row.layout()
+        stack = [item] + self._versions(item.id)[:VERSION_STRIP - 1]
+        for n, version in enumerate(stack):
+            btn = QPushButton()
+            btn.setObjectName("preview_version_btn")
+            btn.setCheckable(True)
+            btn.setChecked(n == 0)
+            btn.setFixedSize(VERSION_THUMB[0] + 8, VERSION_THUMB[1] + 8)
+            btn.setCursor(Qt.CursorShape.PointingHandCursor)
+            btn.setToolTip(version.copied_at.strftime("%H:%M:%S  ·  %B %d"))
+            pix = self._version_thumb(version)
+            if pix is not None:
+                btn.setIcon(QIcon(pix))
+                btn.setIconSize(pix.size())
+            btn.clicked.connect(lambda _, v=version, n=n: self._on_version(v, n, len(stack)))
+            self._version_btns.addButton(btn)
+            lay.insertWidget(lay.count() - 1, btn)
+        self._version_row.setVisible(True)
+
+    def _version_thumb(self, item: ClipItem):
+        pix = self._pixmaps.get(item.id, VERSION_THUMB)
+        if pix is None:
+            full = self._resolve(item)
+            if full is None:
+                return None
+            pix = self._pixmaps.put(item.id, VERSION_THUMB, scaled_pixmap(full.image, *VERSION_THUMB))
+        return pix
+
+    # Paste then takes the version on show
+    def _on_version(self, item: ClipItem, n: int, shown: int):
+        if self._show_image(item, "latest" if n == 0 else f"version {n + 1} of {shown}"):
+            self._item = item
+            self._ts_lbl.setText(item.copied_at.strftime("Copied at %H:%M:%S  ·  %B %d"))
+
+    def _show_stats(self, stats):
+        char_count, word_count, line_count = stats
+        self._meta_lbl.setText(
+            f"{char_count:,} characters  ·  {word_count:,} words  ·  {line_count:,} line{'s' if line_count != 1 else ''}"
+        )
+
+    # Word and line counts are linear in the text; work them out off the GUI thread
+    def _count(self, item: ClipItem, text: str):
+        if item.id in self._counting:
+            return
+        self._counting.add(item.id)
+        def run():
+            item.measure(text)
+            self._stats_ready.emit(item)
+        QThreadPool.globalInstance().start(run)
+
+    def _on_stats(self, item: ClipItem):
+        self._counting.discard(item.id)
+        if item is self._item:
+            self._show_stats(item.stats)
+
     def clear(self):
         self._item = None
+        self._text_view.set_text("")
         self._preview_stack.setCurrentIndex(2)
         self._type_badge.setText("")
         self._ts_lbl.setText("")
         self._meta_lbl.setText("")
+        self._clear_versions()
 
     def _on_paste(self):
         if self._item:
@@ -179,85 +440,369 @@ class PreviewPanel(QWidget):
             self.plain_requested.emit(self._item)
 
 
-class ClipCard(QWidget):
-    paste_sig    = pyqtSignal(dict)
-    plain_sig    = pyqtSignal(dict)
-    delete_sig   = pyqtSignal(int)
-    selected_sig = pyqtSignal(int)
+class ClipGridModel(QAbstractTableModel):
+    def __init__(self, cols=4, parent=None):
+        super().__init__(parent)
+        self._items   = []
+        self._matches = {}
+        self._cols    = cols
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return -(-len(self._items) // self._cols)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._cols
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        return None
+
+    def flags(self, index):
+        if self.item_for(index) is None:
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    # matches maps item ids to the search positions to highlight
+    def set_items(self, items: list, matches=None):
+        self.beginResetModel()
+        self._items   = items
+        self._matches = matches or {}
+        self.endResetModel()
+
+    def matches(self, item: ClipItem):
+        return self._matches.get(item.id, ())
+
+    # Positional edits: at most one trailing row appears or disappears and the
+    # shifted cells are repainted; the view keeps its scroll and selection
+    def insert_item(self, pos: int, item):
+        self._resize(len(self._items) + 1, lambda: self._items.insert(pos, item))
+        self._changed(pos, len(self._items) - 1)
+
+    def remove_item(self, pos: int):
+        removed = []
+        self._resize(len(self._items) - 1, lambda: removed.append(self._items.pop(pos)))
+        # The cell the last card vacated has to repaint as well
+        self._changed(pos, len(self._items))
+        return removed[0]
+
+    def move_item(self, src: int, dst: int):
+        self._items.insert(dst, self._items.pop(src))
+        self._changed(min(src, dst), max(src, dst))
+
+    def append_items(self, items: list):
+        start = len(self._items)
+        self._resize(start + len(items), lambda: self._items.extend(items))
+        self._changed(start, len(self._items) - 1)
+
+    def _resize(self, size: int, mutate):
+        rows, new = self.rowCount(), -(-size // self._cols)
+        if new > rows:
+            self.beginInsertRows(QModelIndex(), rows, new - 1)
+            mutate()
+            self.endInsertRows()
+        elif new < rows:
+            self.beginRemoveRows(QModelIndex(), new, rows - 1)
+            mutate()
+            self.endRemoveRows()
+        else:
+            mutate()
+
+    def _changed(self, first: int, last: int):
+        last = min(last, self.rowCount() * self._cols - 1)
+        if first <= last:
+            self.dataChanged.emit(self.index(first // self._cols, 0),
+                                  self.index(last // self._cols, self._cols - 1))
+
+    def set_columns(self, cols: int):
+        if cols == self._cols:
+            return
+        self.beginResetModel()
+        self._cols = cols
+        self.endResetModel()
+
+    def columns(self):
+        return self._cols
+
+    def items(self):
+        return self._items
+
+    def item_at(self, pos: int):
+        if 0 <= pos < len(self._items):
+            return self._items[pos]
+        return None
+
+    def item_for(self, index: QModelIndex):
+        return self.item_at(self.position(index))
+
+    def position(self, index: QModelIndex):
+        if not index.isValid():
+            return -1
+        return index.row() * self._cols + index.column()
+
+    def index_for(self, pos: int):
+        return self.index(pos // self._cols, pos % self._cols)
+
+
+class ClipCardDelegate(QStyledItemDelegate):
+    delete_requested = pyqtSignal(object)
+
+    C_BG       = QColor(10, 15, 22, 204)
+    C_BG_HOVER = QColor(14, 22, 33, 230)
+    C_BG_SEL   = QColor(22, 38, 50, 242)
+    C_BORDER       = QColor(255, 255, 255, 15)
+    C_BORDER_HOVER = QColor(34, 211, 195, 56)
+    C_BORDER_SEL   = QColor(34, 211, 195, 140)
+    C_TS       = QColor(255, 255, 255, 43)
+    C_TEXT     = QColor(175, 205, 225, 148)
+    C_DEL      = QColor(255, 70, 70, 56)
+    C_DEL_HOT  = QColor(255, 100, 100, 191)
+    C_DEL_BG   = QColor(255, 70, 70, 26)
+    C_ACCENT   = QColor(34, 211, 195)
+    BADGES = {
+        "image": ("IMG", QColor(34, 211, 195), QColor(34, 211, 195, 33), QColor(34, 211, 195, 66)),
+        "text":  ("TXT", QColor(99, 179, 237), QColor(99, 179, 237, 33), QColor(99, 179, 237, 66)),
+    }
 
-    def __init__(self, item: dict, index: int, parent=None):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.item  = item
-        self.index = index
-        self.setObjectName("ClipCard")
-        self.setFixedSize(240, 130)
-        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self._selected = False
+        self._hot_delete   = QModelIndex()
+        self._thumb_loader = None
+        self._pixmaps      = PixmapCache()
+
+    def set_thumb_loader(self, loader):
+        self._thumb_loader = loader
+
+    def set_pixmap_cache(self, cache: PixmapCache):
+        self._pixmaps = cache
+
+    def clear_hot(self):
+        self._hot_delete = QModelIndex()
+
+    def sizeHint(self, option, index):
+        return QSize(CARD_W + CARD_GAP, CARD_H + CARD_GAP)
+
+    def _card_rect(self, option):
+        return QRect(option.rect.x(), option.rect.y(), CARD_W, CARD_H)
+
+    def _delete_rect(self, card: QRect):
+        return QRect(card.right() - 12 - 18, card.y() + 10, 18, 18)
+
+    def _font(self, base: QFont, px: int, bold=False, family=None):
+        f = QFont(base)
+        if family:
+            f.setFamily(family)
+        f.setPixelSize(px)
+        f.setBold(bold)
+        return f
+
+    def _thumbnail(self, item: ClipItem):
+        pix = self._pixmaps.get(item.id, THUMB_SIZE)
+        if pix is None:
+            if item.image is not None:
+                src = item.image
+            else:
+                src  = QPixmap()
+                data = self._thumb_loader(item.id) if self._thumb_loader else None
+                if data:
+                    src.loadFromData(data)
+            pix = self._pixmaps.put(item.id, THUMB_SIZE, scaled_pixmap(src, *THUMB_SIZE))
+        return pix
+
+    # Loads thumbnails into the cache ahead of the first paint
+    def prefetch(self, items):
+        for item in items:
+            if item.type == "image" and not item.pending:
+                self._thumbnail(item)
+
+    def paint(self, painter: QPainter, option, index):
+        item = index.model().item_for(index)
+        if item is None:
+            return
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        hovered  = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        card     = self._card_rect(option)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+        # Card body
+        if selected:
+            bg, border, width = self.C_BG_SEL, self.C_BORDER_SEL, 1.5
+        elif hovered:
+            bg, border, width = self.C_BG_HOVER, self.C_BORDER_HOVER, 1.0
+        else:
+            bg, border, width = self.C_BG, self.C_BORDER, 1.0
+        painter.setPen(QPen(border, width))
+        painter.setBrush(bg)
+        painter.drawRoundedRect(QRectF(card).adjusted(0.5, 0.5, -0.5, -0.5), 14, 14)
 
-        root = QVBoxLayout(self)
-        root.setContentsMargins(12, 10, 12, 10)
-        root.setSpacing(5)
+        inner = card.adjusted(12, 10, -12, -10)
 
         # Top row
-        top = QHBoxLayout()
-        top.setSpacing(6)
-
-        badge = QLabel("IMG" if item["type"] == "image" else "TXT")
-        badge.setObjectName("badge_img" if item["type"] == "image" else "badge_txt")
-        badge.setFixedHeight(17)
-        top.addWidget(badge)
-
-        ts = QLabel(item["ts"].strftime("%H:%M"))
-        ts.setObjectName("card_ts")
-        top.addWidget(ts)
-        top.addStretch()
-
-        del_btn = QPushButton("✕")
-        del_btn.setObjectName("card_del")
-        del_btn.setFixedSize(18, 18)
-        del_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        del_btn.clicked.connect(lambda: self.delete_sig.emit(self.index))
-        top.addWidget(del_btn)
-        root.addLayout(top)
+        tag, fg, badge_bg, badge_border = self.BADGES.get(item.type, self.BADGES["text"])
+        badge_font = self._font(option.font, 9, bold=True)
+        painter.setFont(badge_font)
+        badge = QRect(inner.x(), inner.y(), painter.fontMetrics().horizontalAdvance(tag) + 12, 17)
+        painter.setPen(QPen(badge_border, 1))
+        painter.setBrush(badge_bg)
+        painter.drawRoundedRect(QRectF(badge).adjusted(0.5, 0.5, -0.5, -0.5), 4, 4)
+        painter.setPen(fg)
+        painter.drawText(badge, Qt.AlignmentFlag.AlignCenter, tag)
+
+        painter.setFont(self._font(option.font, 10, family="Consolas"))
+        painter.setPen(self.C_TS)
+        ts = QRect(badge.right() + 7, inner.y(), 60, 17)
+        stamp = item.copied_at.strftime("%H:%M")
+        painter.drawText(ts, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, stamp)
+        if item.versions:
+            painter.setPen(fg)
+            painter.drawText(QRect(ts.x() + painter.fontMetrics().horizontalAdvance(stamp) + 8,
+                                   inner.y(), 60, 17),
+                             Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+                             f"⧉ {item.versions + 1}")
+
+        del_rect = self._delete_rect(card)
+        hot = self._hot_delete.isValid() and self._hot_delete == index
+        if hot:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(self.C_DEL_BG)
+            painter.drawRoundedRect(QRectF(del_rect), 3, 3)
+        painter.setFont(self._font(option.font, 11))
+        painter.setPen(self.C_DEL_HOT if hot else self.C_DEL)
+        painter.drawText(del_rect, Qt.AlignmentFlag.AlignCenter, "✕")
 
         # Content preview
-        if item["type"] == "image":
-            preview = QLabel()
-            qt_img = ImageQt.ImageQt(item["image"].convert("RGBA"))
-            pix = QPixmap.fromImage(qt_img).scaled(
-                216, 60,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation)
-            preview.setPixmap(pix)
-            preview.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            preview.setObjectName("card_img_preview")
-            root.addWidget(preview, stretch=1)
+        content = QRect(inner.x(), inner.y() + 17 + 5, inner.width(), inner.height() - 17 - 5 - 7)
+        if item.pending:
+            painter.setFont(self._font(option.font, 11))
+            painter.setPen(self.C_TS)
+            painter.drawText(content, Qt.AlignmentFlag.AlignCenter,
+                             f"{item.label}\nProcessing…" if item.type == "image" else "Processing…")
+        elif item.type == "image":
+            pix = self._thumbnail(item)
+            x = content.x() + (content.width() - pix.width()) // 2
+            y = content.y() + (content.height() - pix.height()) // 2
+            painter.drawPixmap(x, y, pix)
         else:
-            text_preview = QLabel(item["text"][:120])
-            text_preview.setObjectName("card_text_preview")
-            text_preview.setWordWrap(True)
-            text_preview.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-            root.addWidget(text_preview, stretch=1)
-
-        self._sel_bar = QFrame()
-        self._sel_bar.setObjectName("sel_bar")
-        self._sel_bar.setFixedHeight(2)
-        self._sel_bar.setVisible(False)
-        root.addWidget(self._sel_bar)
-
-    def set_selected(self, val: bool):
-        if self._selected == val:
-            return
-        self._selected = val
-        self._sel_bar.setVisible(val)
-        self.setProperty("selected", val)
-        self.style().unpolish(self)
-        self.style().polish(self)
-
-    def mousePressEvent(self, e):
-        if e.button() == Qt.MouseButton.LeftButton:
-            self.selected_sig.emit(self.index)
-
-    def mouseDoubleClickEvent(self, e):
-        self.paste_sig.emit(self.item)
\ No newline at end of file
+            font = self._font(option.font, 12)
+            painter.setFont(font)
+            painter.setPen(self.C_TEXT)
+            painter.setClipRect(content)
+            positions = index.model().matches(item)
+            if positions:
+                self._draw_highlighted(painter, content, font, item.label, positions)
+            else:
+                painter.drawText(content,
+                                 Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft | Qt.TextFlag.TextWordWrap,
+                                 item.label)
+            painter.setClipping(False)
+
+        if selected:
+            grad = QLinearGradient(inner.left(), 0, inner.right(), 0)
+            grad.setColorAt(0.0, QColor(34, 211, 195, 0))
+            grad.setColorAt(0.3, self.C_ACCENT)
+            grad.setColorAt(0.7, self.C_ACCENT)
+            grad.setColorAt(1.0, QColor(34, 211, 195, 0))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(grad)
+            painter.drawRoundedRect(QRectF(inner.x(), inner.bottom() - 1, inner.width(), 2), 1, 1)
+
+        painter.restore()
+
+    # Word-wrapped like drawText, with the matched characters picked out
+    def _draw_highlighted(self, painter: QPainter, rect: QRect, font: QFont, text: str, positions):
+        fmt = QTextCharFormat()
+        fmt.setForeground(C_MATCH)
+        fmt.setBackground(C_MATCH_BG)
+        fmt.setFontWeight(QFont.Weight.Bold)
+        ranges = []
+        for start, length in qt_spans(text, [p for p in positions if p < len(text)]):
+            r = QTextLayout.FormatRange()
+            r.start, r.length, r.format = start, length, fmt
+            ranges.append(r)
+
+        layout = QTextLayout(text, font)
+        opt = QTextOption()
+        opt.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(opt)
+        layout.setFormats(ranges)
+        layout.beginLayout()
+        y = 0.0
+        while y < rect.height():
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(rect.width())
+            line.setPosition(QPointF(0, y))
+            y += line.height()
+        layout.endLayout()
+        layout.draw(painter, QPointF(rect.topLeft()))
+
+    def editorEvent(self, event, model, option, index):
+        item = index.model().item_for(index)
+        if item is None:
+            return False
+        t = event.type()
+        if t not in (QEvent.Type.MouseMove, QEvent.Type.MouseButtonPress,
+                     QEvent.Type.MouseButtonRelease, QEvent.Type.MouseButtonDblClick):
+            return False
+        on_delete = self._delete_rect(self._card_rect(option)).contains(event.position().toPoint())
+
+        if t == QEvent.Type.MouseMove:
+            hot = index if on_delete else QModelIndex()
+            if hot != self._hot_delete:
+                old, self._hot_delete = self._hot_delete, QModelIndex(hot)
+                view = self.parent()
+                if view is not None:
+                    if old.isValid():
+                        view.update(old)
+                    view.update(index)
+            return False
+
+        if on_delete and event.button() == Qt.MouseButton.LeftButton:
+            if t == QEvent.Type.MouseButtonRelease:
+                self.clear_hot()
+                self.delete_requested.emit(item)
+            return True
+        return False
+
+
+class ClipGrid(QTableView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setObjectName("clip_grid")
+        self.setShowGrid(False)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setMouseTracking(True)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
+        self.verticalScrollBar().setSingleStep(24)
+
+        pal = self.palette()
+        pal.setColor(QPalette.ColorRole.Highlight, Qt.GlobalColor.transparent)
+        self.setPalette(pal)
+
+        for header, size in ((self.horizontalHeader(), CARD_W + CARD_GAP),
+                             (self.verticalHeader(),   CARD_H + CARD_GAP)):
+            header.setVisible(False)
+            header.setMinimumSectionSize(1)
+            header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+            header.setDefaultSectionSize(size)
+
+        self._delegate = ClipCardDelegate(self)
+        self.setItemDelegate(self._delegate)
+
+    def card_delegate(self):
+        return self._delegate
+
+    def leaveEvent(self, e):
+        self._delegate.clear_hot()
+        self.viewport().update()
+        super().leaveEvent(e)